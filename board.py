@@ -4,13 +4,14 @@
 import os
 import pygame
 from settings import WIDTH, HEIGHT, ROWS, COLS, SQUARE_SIZE, LIGHT, DARK, WHITE_FOLDER, BLACK_FOLDER
+from encoding import from_string_board, piece_code
 
 PIECE_NAMES = ["king", "queen", "rook", "bishop", "knight", "pawn"]
 
 class Board:
     def __init__(self):
-        # 8x8 array of strings like "wking", "bpawn", or "".
-        self.initial_board = [
+        # flat 64-element bytearray of piece codes (see encoding.py), built from strings like "wking".
+        self.initial_board = from_string_board([
             ["brook", "bknight", "bbishop", "bqueen", "bking", "bbishop", "bknight", "brook"],
             ["bpawn"] * 8,
             [""] * 8,
@@ -19,9 +20,9 @@ class Board:
             [""] * 8,
             ["wpawn"] * 8,
             ["wrook", "wknight", "wbishop", "wqueen", "wking", "wbishop", "wknight", "wrook"],
-        ]
-        self.board = [row[:] for row in self.initial_board]
-        self.piece_images = {}
+        ])
+        self.board = bytearray(self.initial_board)
+        self.piece_images = {}  # keyed by piece code
         self.load_images()
 
     def load_images(self):
@@ -33,22 +34,22 @@ class Board:
             w_path = os.path.join(WHITE_FOLDER, f"{name}.png")
             b_path = os.path.join(BLACK_FOLDER, f"{name}.png")
             try:
-                self.piece_images["w" + name] = load_and_scale(w_path)
+                self.piece_images[piece_code("w" + name)] = load_and_scale(w_path)
             except Exception as e:
                 print("Warning: can't load", w_path, e)
             try:
-                self.piece_images["b" + name] = load_and_scale(b_path)
+                self.piece_images[piece_code("b" + name)] = load_and_scale(b_path)
             except Exception as e:
                 print("Warning: can't load", b_path, e)
 
     def reset(self):
-        self.board = [row[:] for row in self.initial_board]
+        self.board = bytearray(self.initial_board)
 
     def get(self, r, c):
-        return self.board[r][c]
+        return self.board[r * COLS + c]
 
     def set(self, r, c, val):
-        self.board[r][c] = val
+        self.board[r * COLS + c] = val
 
     def draw(self, screen):
         # draw squares
@@ -59,7 +60,7 @@ class Board:
         # draw pieces
         for r in range(ROWS):
             for c in range(COLS):
-                p = self.board[r][c]
+                p = self.board[r * COLS + c]
                 if p:
                     img = self.piece_images.get(p)
                     if img:
@@ -70,4 +71,4 @@ class Board:
                                           SQUARE_SIZE - 16, SQUARE_SIZE - 16))
 
     def copy_board(self):
-        return [row[:] for row in self.board]
+        return bytearray(self.board)
@@ -0,0 +1,90 @@
+# encoding.py
+# Compact piece / board encoding used by the engine.
+# A piece is a small int: colour bit | kind, 0 = empty square.
+# A board is a flat 64-element bytearray indexed by r * 8 + c.
+
+EMPTY = 0
+
+# kinds (order matches the ChessEnv observation planes)
+PAWN, ROOK, BISHOP, KNIGHT, QUEEN, KING = 1, 2, 3, 4, 5, 6
+KIND_MASK = 7
+
+# colours; `color ^ COLOR_MASK` is the opponent
+WHITE, BLACK = 8, 16
+COLOR_MASK = WHITE | BLACK
+
+KIND_NAMES = {PAWN: "pawn", ROOK: "rook", BISHOP: "bishop", KNIGHT: "knight", QUEEN: "queen", KING: "king"}
+KIND_CODES = {name: kind for kind, name in KIND_NAMES.items()}
+COLOR_NAMES = {WHITE: "w", BLACK: "b"}
+COLOR_CODES = {"w": WHITE, "b": BLACK}
+
+# castling rights bitmask
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+ALL_CASTLING = 15
+
+# rights lost when a move starts or ends on a square (king / rook home squares)
+CASTLING_LOST = [0] * 64
+CASTLING_LOST[0] = BLACK_QUEENSIDE
+CASTLING_LOST[4] = BLACK_KINGSIDE | BLACK_QUEENSIDE
+CASTLING_LOST[7] = BLACK_KINGSIDE
+CASTLING_LOST[56] = WHITE_QUEENSIDE
+CASTLING_LOST[60] = WHITE_KINGSIDE | WHITE_QUEENSIDE
+CASTLING_LOST[63] = WHITE_KINGSIDE
+
+
+def color_of(piece):
+    return piece & COLOR_MASK
+
+
+def kind_of(piece):
+    return piece & KIND_MASK
+
+
+def piece_code(name):
+    """"wknight" -> WHITE | KNIGHT, "" -> EMPTY."""
+    if not name:
+        return EMPTY
+    return COLOR_CODES[name[0]] | KIND_CODES[name[1:]]
+
+
+def piece_name(piece):
+    """WHITE | KNIGHT -> "wknight", EMPTY -> ""."""
+    if not piece:
+        return ""
+    return COLOR_NAMES[piece & COLOR_MASK] + KIND_NAMES[piece & KIND_MASK]
+
+
+def from_string_board(board):
+    """8x8 list of strings like "wking" / "" -> flat bytearray."""
+    return bytearray(piece_code(board[r][c]) for r in range(8) for c in range(8))
+
+
+def to_string_board(squares):
+    """Flat bytearray -> 8x8 list of strings like "wking" / ""."""
+    return [[piece_name(squares[r * 8 + c]) for c in range(8)] for r in range(8)]
+
+
+def castling_from_has_moved(has_moved):
+    """Old-style has_moved dict ("wking", "wrook_k", ...) -> castling bitmask."""
+    rights = 0
+    for color, king_side, queen_side in (("w", WHITE_KINGSIDE, WHITE_QUEENSIDE),
+                                         ("b", BLACK_KINGSIDE, BLACK_QUEENSIDE)):
+        if has_moved.get(color + "king", True):
+            continue
+        if not has_moved.get(color + "rook_k", True):
+            rights |= king_side
+        if not has_moved.get(color + "rook_q", True):
+            rights |= queen_side
+    return rights
+
+
+def has_moved_from_castling(rights):
+    """Castling bitmask -> old-style has_moved dict."""
+    return {
+        "wking": not rights & (WHITE_KINGSIDE | WHITE_QUEENSIDE),
+        "bking": not rights & (BLACK_KINGSIDE | BLACK_QUEENSIDE),
+        "wrook_k": not rights & WHITE_KINGSIDE,
+        "wrook_q": not rights & WHITE_QUEENSIDE,
+        "brook_k": not rights & BLACK_KINGSIDE,
+        "brook_q": not rights & BLACK_QUEENSIDE,
+    }
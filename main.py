@@ -9,6 +9,7 @@ from settings import WIDTH, HEIGHT, SQUARE_SIZE, FPS
 from rl.game_state import GameState
 
 from rules import is_in_check
+from encoding import WHITE, BLACK, color_of
 
 def main():
     pygame.init()
@@ -27,14 +28,14 @@ def main():
         gs.board_obj.draw(screen)
 
         # highlight valid moves
-        if gs.selected and gs.board[gs.selected[0]][gs.selected[1]] and gs.board[gs.selected[0]][gs.selected[1]][0] == gs.turn:
+        if gs.selected and color_of(gs.board[gs.selected[0] * 8 + gs.selected[1]]) == gs.turn:
             for rr, cc in gs.valid_moves:
                 s = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
                 s.fill((50, 205, 50, 100))
                 screen.blit(s, (cc * SQUARE_SIZE, rr * SQUARE_SIZE))
 
         # show turn
-        font.render_to(screen, (5, 5), f"Turn: {'White' if gs.turn == 'w' else 'Black'}", (0, 0, 0))
+        font.render_to(screen, (5, 5), f"Turn: {'White' if gs.turn == WHITE else 'Black'}", (0, 0, 0))
 
         pygame.display.flip()
 
@@ -47,7 +48,7 @@ def main():
                 if not (0 <= r < 8 and 0 <= c < 8):
                     continue
                 if gs.selected is None:
-                    if gs.board[r][c] != "" and gs.board[r][c][0] == gs.turn:
+                    if color_of(gs.board[r * 8 + c]) == gs.turn:
                         gs.selected = (r, c)
                         gs.valid_moves = gs.get_valid_moves_for(r, c)
                 else:
@@ -62,21 +63,18 @@ def main():
 
                         # check for checkmate/stalemate
                         has_any = False
-                        for rr in range(8):
-                            for cc in range(8):
-                                if gs.board[rr][cc] != "" and gs.board[rr][cc][0] == gs.turn:
-                                    if gs.get_valid_moves_for(rr, cc):
-                                        has_any = True
-                                        break
-                            if has_any:
-                                break
+                        for sq in range(64):
+                            if color_of(gs.board[sq]) == gs.turn:
+                                if gs.get_valid_moves_for(*divmod(sq, 8)):
+                                    has_any = True
+                                    break
                         if not has_any:
                             if is_in_check(gs.board, gs.turn):
-                                print("Checkmate!", "White wins" if gs.turn == 'b' else "Black wins")
+                                print("Checkmate!", "White wins" if gs.turn == BLACK else "Black wins")
                             else:
                                 print("Stalemate!")
                             running = False
-                    elif gs.board[r][c] != "" and gs.board[r][c][0] == gs.turn:
+                    elif color_of(gs.board[r * 8 + c]) == gs.turn:
                         gs.selected = (r, c)
                         gs.valid_moves = gs.get_valid_moves_for(r, c)
                     else:
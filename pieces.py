@@ -4,29 +4,32 @@
 
 from settings import ROWS, COLS
 from rules import in_bounds, attacks_square, is_in_check
+from encoding import (EMPTY, PAWN, ROOK, BISHOP, KNIGHT, QUEEN, KING, KIND_MASK, COLOR_MASK, WHITE,
+                      WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE)
 
 def is_empty(board, r, c):
-    return board[r][c] == ""
+    return board[r * COLS + c] == EMPTY
 
 class MoveGenerator:
     def __init__(self):
-        # Castling flags are in GameState.has_moved
+        # Castling rights are in GameState.castling
         pass
 
-    def legal_moves(self, board, r, c, en_passant_target, has_moved):
+    def legal_moves(self, board, r, c, en_passant_target, castling):
         """
         Returns a list of (r2, c2) target squares for the piece on (r, c),
         without ensuring the king isn't left in check.
+        board is a flat bytearray of piece codes, castling a rights bitmask (see encoding.py).
         """
-        piece = board[r][c]
+        piece = board[r * COLS + c]
         if not piece:
             return []
-        color, kind = piece[0], piece[1:]
+        color, kind = piece & COLOR_MASK, piece & KIND_MASK
         moves = []
 
-        if kind == "pawn":
-            direction = -1 if color == 'w' else 1
-            start_row = 6 if color == 'w' else 1
+        if kind == PAWN:
+            direction = -1 if color == WHITE else 1
+            start_row = 6 if color == WHITE else 1
             # one-step forward
             if in_bounds(r + direction, c) and is_empty(board, r + direction, c):
                 moves.append((r + direction, c))
@@ -36,60 +39,34 @@ class MoveGenerator:
             # normal captures
             for dc in (-1, 1):
                 nr, nc = r + direction, c + dc
-                if in_bounds(nr, nc) and board[nr][nc] and board[nr][nc][0] != color:
-                    moves.append((nr, nc))
+                if in_bounds(nr, nc):
+                    target = board[nr * COLS + nc]
+                    if target and target & COLOR_MASK != color:
+                        moves.append((nr, nc))
             # en passant
             if en_passant_target:
                 er, ec = en_passant_target
                 for dc in (-1, 1):
                     if (r + direction, c + dc) == (er, ec):
                         adj_r, adj_c = r, c + dc
-                        if in_bounds(adj_r, adj_c) and board[adj_r][adj_c] and board[adj_r][adj_c][0] != color and board[adj_r][adj_c][1:] == "pawn":
-                            moves.append((er, ec))
+                        if in_bounds(adj_r, adj_c):
+                            adj = board[adj_r * COLS + adj_c]
+                            if adj and adj & COLOR_MASK != color and adj & KIND_MASK == PAWN:
+                                moves.append((er, ec))
 
-        elif kind == "rook":
+        elif kind == ROOK:
             dirs = [(1,0),(-1,0),(0,1),(0,-1)]
-            for dr, dc in dirs:
-                nr, nc = r + dr, c + dc
-                while in_bounds(nr, nc):
-                    if is_empty(board, nr, nc):
-                        moves.append((nr, nc))
-                    else:
-                        if board[nr][nc][0] != color:
-                            moves.append((nr, nc))
-                        break
-                    nr += dr
-                    nc += dc
+            self._slide(board, r, c, color, dirs, moves)
 
-        elif kind == "bishop":
+        elif kind == BISHOP:
             dirs = [(1,1),(1,-1),(-1,1),(-1,-1)]
-            for dr, dc in dirs:
-                nr, nc = r + dr, c + dc
-                while in_bounds(nr, nc):
-                    if is_empty(board, nr, nc):
-                        moves.append((nr, nc))
-                    else:
-                        if board[nr][nc][0] != color:
-                            moves.append((nr, nc))
-                        break
-                    nr += dr
-                    nc += dc
+            self._slide(board, r, c, color, dirs, moves)
 
-        elif kind == "queen":
+        elif kind == QUEEN:
             dirs = [(1,0),(-1,0),(0,1),(0,-1),(1,1),(1,-1),(-1,1),(-1,-1)]
-            for dr, dc in dirs:
-                nr, nc = r + dr, c + dc
-                while in_bounds(nr, nc):
-                    if is_empty(board, nr, nc):
-                        moves.append((nr, nc))
-                    else:
-                        if board[nr][nc][0] != color:
-                            moves.append((nr, nc))
-                        break
-                    nr += dr
-                    nc += dc
+            self._slide(board, r, c, color, dirs, moves)
 
-        elif kind == "knight":
+        elif kind == KNIGHT:
             candidates = [
                 (r + 2, c + 1), (r + 2, c - 1),
                 (r - 2, c + 1), (r - 2, c - 1),
@@ -97,63 +74,83 @@ class MoveGenerator:
                 (r - 1, c + 2), (r - 1, c - 2),
             ]
             for nr, nc in candidates:
-                if in_bounds(nr, nc) and (is_empty(board, nr, nc) or board[nr][nc][0] != color):
+                if in_bounds(nr, nc) and board[nr * COLS + nc] & COLOR_MASK != color:
                     moves.append((nr, nc))
 
-        elif kind == "king":
+        elif kind == KING:
             for dr in (-1, 0, 1):
                 for dc in (-1, 0, 1):
                     if dr == 0 and dc == 0:
                         continue
                     nr, nc = r + dr, c + dc
-                    if in_bounds(nr, nc) and (is_empty(board, nr, nc) or board[nr][nc][0] != color):
+                    if in_bounds(nr, nc) and board[nr * COLS + nc] & COLOR_MASK != color:
                         moves.append((nr, nc))
 
-            # castling (needs has_moved + attacks_square)
-            enemy = 'b' if color == 'w' else 'w'
-            row = 7 if color == 'w' else 0
-            if r == row and c == 4 and not has_moved.get(color + 'king', True):
-                rook_name = ('wrook' if color == 'w' else 'brook')
+            # castling (needs castling rights + attacks_square)
+            enemy = color ^ COLOR_MASK
+            row = 7 if color == WHITE else 0
+            king_side = WHITE_KINGSIDE if color == WHITE else BLACK_KINGSIDE
+            queen_side = WHITE_QUEENSIDE if color == WHITE else BLACK_QUEENSIDE
+            base = row * COLS
+            if r == row and c == 4 and castling & (king_side | queen_side):
+                rook = color | ROOK
                 # king side
-                if board[row][7] == rook_name and not has_moved.get(color + 'rook_k', True):
-                    if board[row][5] == "" and board[row][6] == "":
+                if castling & king_side and board[base + 7] == rook:
+                    if board[base + 5] == EMPTY and board[base + 6] == EMPTY:
                         if not attacks_square(board, row, 4, enemy) and not attacks_square(board, row, 5, enemy) and not attacks_square(board, row, 6, enemy):
                             moves.append((row, 6))
                 # queen side
-                if board[row][0] == rook_name and not has_moved.get(color + 'rook_q', True):
-                    if board[row][1] == "" and board[row][2] == "" and board[row][3] == "":
+                if castling & queen_side and board[base] == rook:
+                    if board[base + 1] == EMPTY and board[base + 2] == EMPTY and board[base + 3] == EMPTY:
                         if not attacks_square(board, row, 4, enemy) and not attacks_square(board, row, 3, enemy) and not attacks_square(board, row, 2, enemy):
                             moves.append((row, 2))
 
         return moves
 
-    def legal_moves_safe(self, board, r, c, en_passant_target, has_moved):
+    def _slide(self, board, r, c, color, dirs, moves):
+        for dr, dc in dirs:
+            nr, nc = r + dr, c + dc
+            while in_bounds(nr, nc):
+                target = board[nr * COLS + nc]
+                if target == EMPTY:
+                    moves.append((nr, nc))
+                else:
+                    if target & COLOR_MASK != color:
+                        moves.append((nr, nc))
+                    break
+                nr += dr
+                nc += dc
+
+    def legal_moves_safe(self, board, r, c, en_passant_target, castling):
         """
         Returns only moves that do not leave own king in check.
         """
-        moves = self.legal_moves(board, r, c, en_passant_target, has_moved)
+        moves = self.legal_moves(board, r, c, en_passant_target, castling)
         safe = []
-        piece = board[r][c]
+        fr = r * COLS + c
+        piece = board[fr]
         if not piece:
             return safe
-        color = piece[0]
+        color, kind = piece & COLOR_MASK, piece & KIND_MASK
 
         for (r2, c2) in moves:
-            temp = [row[:] for row in board]
+            to = r2 * COLS + c2
+            temp = bytearray(board)
             # en passant capture
-            if piece[1:] == "pawn" and en_passant_target and (r2, c2) == en_passant_target and c2 != c and temp[r][c2] == "":
-                direction = -1 if color == 'w' else 1
-                temp[r2 - direction][c2] = ""
-            temp[r2][c2] = temp[r][c]
-            temp[r][c] = ""
+            if kind == PAWN and en_passant_target and (r2, c2) == en_passant_target and c2 != c and temp[to] == EMPTY:
+                direction = -1 if color == WHITE else 1
+                temp[(r2 - direction) * COLS + c2] = EMPTY
+            temp[to] = piece
+            temp[fr] = EMPTY
             # castling: move rook too
-            if piece[1:] == "king" and abs(c2 - c) == 2:
+            if kind == KING and abs(c2 - c) == 2:
+                base = r * COLS
                 if c2 == 6:
-                    temp[r][5] = temp[r][7]
-                    temp[r][7] = ""
+                    temp[base + 5] = temp[base + 7]
+                    temp[base + 7] = EMPTY
                 elif c2 == 2:
-                    temp[r][3] = temp[r][0]
-                    temp[r][0] = ""
+                    temp[base + 3] = temp[base]
+                    temp[base] = EMPTY
             if not is_in_check(temp, color):
                 safe.append((r2, c2))
         return safe
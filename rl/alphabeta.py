@@ -0,0 +1,323 @@
+# rl/alphabeta.py
+# Classical bot: iterative-deepening alpha-beta (negamax) with a fixed-size
+# transposition table, MVV-LVA / killer / history move ordering, quiescence
+# search and a material + piece-square evaluation.
+# Move generation and legality come from GameState / MoveGenerator.
+import time
+
+from rules import is_in_check
+from encoding import PAWN, ROOK, BISHOP, KNIGHT, QUEEN, KING, KIND_MASK, COLOR_MASK, WHITE
+
+from .rl_utils import action_to_index, PROMO_KINDS
+
+PIECE_VALUES = [0] * 8  # indexed by kind
+PIECE_VALUES[PAWN], PIECE_VALUES[KNIGHT], PIECE_VALUES[BISHOP] = 100, 320, 330
+PIECE_VALUES[ROOK], PIECE_VALUES[QUEEN], PIECE_VALUES[KING] = 500, 900, 0
+
+# Piece-square tables from White's point of view, row 0 = 8th rank
+# (same orientation as GameState.board). Black uses the row-mirrored square (sq ^ 56).
+_PST_ROWS = {
+    PAWN: [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [10, 10, 20, 30, 30, 20, 10, 10],
+        [5, 5, 10, 25, 25, 10, 5, 5],
+        [0, 0, 0, 20, 20, 0, 0, 0],
+        [5, -5, -10, 0, 0, -10, -5, 5],
+        [5, 10, 10, -20, -20, 10, 10, 5],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+    ],
+    KNIGHT: [
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+        [-40, -20, 0, 0, 0, 0, -20, -40],
+        [-30, 0, 10, 15, 15, 10, 0, -30],
+        [-30, 5, 15, 20, 20, 15, 5, -30],
+        [-30, 0, 15, 20, 20, 15, 0, -30],
+        [-30, 5, 10, 15, 15, 10, 5, -30],
+        [-40, -20, 0, 5, 5, 0, -20, -40],
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+    ],
+    BISHOP: [
+        [-20, -10, -10, -10, -10, -10, -10, -20],
+        [-10, 0, 0, 0, 0, 0, 0, -10],
+        [-10, 0, 5, 10, 10, 5, 0, -10],
+        [-10, 5, 5, 10, 10, 5, 5, -10],
+        [-10, 0, 10, 10, 10, 10, 0, -10],
+        [-10, 10, 10, 10, 10, 10, 10, -10],
+        [-10, 5, 0, 0, 0, 0, 5, -10],
+        [-20, -10, -10, -10, -10, -10, -10, -20],
+    ],
+    ROOK: [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [5, 10, 10, 10, 10, 10, 10, 5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [0, 0, 0, 5, 5, 0, 0, 0],
+    ],
+    QUEEN: [
+        [-20, -10, -10, -5, -5, -10, -10, -20],
+        [-10, 0, 0, 0, 0, 0, 0, -10],
+        [-10, 0, 5, 5, 5, 5, 0, -10],
+        [-5, 0, 5, 5, 5, 5, 0, -5],
+        [0, 0, 5, 5, 5, 5, 0, -5],
+        [-10, 5, 5, 5, 5, 5, 0, -10],
+        [-10, 0, 5, 0, 0, 0, 0, -10],
+        [-20, -10, -10, -5, -5, -10, -10, -20],
+    ],
+    KING: [
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-20, -30, -30, -40, -40, -30, -30, -20],
+        [-10, -20, -20, -20, -20, -20, -20, -10],
+        [20, 20, 0, 0, 0, 0, 20, 20],
+        [20, 30, 10, 0, 0, 10, 30, 20],
+    ],
+}
+
+PST = {kind: [v for row in rows for v in row] for kind, rows in _PST_ROWS.items()}  # flat, index r * 8 + c
+
+MATE = 100000
+MATE_BOUND = MATE - 1000  # scores beyond this are mates, -MATE + ply for the side to move
+INF = 10 ** 9
+
+# transposition table entry flags
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# promotion codes as in rl_utils: 1=queen, 2=rook, 3=bishop, 4=knight
+SEARCH_PROMOS = (1, 4)  # rook/bishop underpromotions are never better than queen
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def evaluate(gs):
+    """Material + piece-square score in centipawns, from the side to move's view."""
+    score = 0
+    for sq, p in enumerate(gs.board):
+        if not p:
+            continue
+        kind = p & KIND_MASK
+        if p & COLOR_MASK == WHITE:
+            score += PIECE_VALUES[kind] + PST[kind][sq]
+        else:
+            score -= PIECE_VALUES[kind] + PST[kind][sq ^ 56]
+    return score if gs.turn == WHITE else -score
+
+
+def _score_to_tt(score, ply):
+    """Root-relative mate score (-MATE + ply) -> relative to the node at `ply`, for the TT."""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class AlphaBetaBot:
+    def __init__(self, max_depth=4, time_limit=2.0, tt_bits=18):
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+
+        # fixed-size, always-replace-unless-deeper transposition table
+        self.tt_mask = (1 << tt_bits) - 1
+        self.tt = [None] * (1 << tt_bits)
+
+        self.killers = []
+        self.history = {}
+        self.nodes = 0
+        self.deadline = None
+
+    def select_action(self, env):
+        move = self.search(env.gs)
+        if move is None:
+            return None
+        r0, c0, r1, c1, promo = move
+        return env.from_real_action(action_to_index(r0 * 8 + c0, r1 * 8 + c1, promo))
+
+    def search(self, gs):
+        """Iterative deepening; returns (r0, c0, r1, c1, promo) or None if no legal move."""
+        moves = self._moves(gs)
+        if not moves:
+            return None
+
+        self.deadline = time.time() + self.time_limit if self.time_limit else None
+        self.killers = [[None, None] for _ in range(self.max_depth + 64)]
+        self.history = {}
+        self.nodes = 0
+
+        best = moves[0]
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, move = self._root(gs, moves, depth)
+            except SearchTimeout:
+                break
+            best = move
+            if abs(score) >= MATE_BOUND:
+                break
+        return best
+
+    # ---- search ----
+
+    def _tick(self):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 255 == 0 and time.time() > self.deadline:
+            raise SearchTimeout()
+
+    def _root(self, gs, moves, depth):
+        key = gs.history[-1]
+        entry = self.tt[key & self.tt_mask]
+        tt_move = entry[4] if entry is not None and entry[0] == key else None
+
+        alpha, beta = -INF, INF
+        best_move = None
+        for move in self._order(gs, moves, tt_move, 0):
+            score = -self._negamax(self._play(gs, move), depth - 1, -beta, -alpha, 1)
+            if score > alpha or best_move is None:
+                alpha, best_move = score, move
+        self._store(key, depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def _negamax(self, gs, depth, alpha, beta, ply):
+        self._tick()
+        # draws by rule (ChessEnv.step ends the game on them); checked before the TT,
+        # whose scores do not depend on the path. A repeat counts as the threefold.
+        if gs.repetition_count() >= 2 or gs.is_fifty_move_draw():
+            return 0
+        key = gs.history[-1]
+        entry = self.tt[key & self.tt_mask]
+        tt_move = None
+        if entry is not None and entry[0] == key:
+            _, e_depth, e_score, e_flag, tt_move = entry
+            e_score = _score_from_tt(e_score, ply)
+            if e_depth >= depth:
+                if e_flag == EXACT:
+                    return e_score
+                if e_flag == LOWER and e_score >= beta:
+                    return e_score
+                if e_flag == UPPER and e_score <= alpha:
+                    return e_score
+
+        if depth <= 0:
+            return self._quiesce(gs, alpha, beta, ply)
+
+        moves = self._moves(gs)
+        if not moves:
+            return -MATE + ply if is_in_check(gs.board, gs.turn) else 0
+
+        alpha_orig = alpha
+        best_score, best_move = -INF, None
+        for move in self._order(gs, moves, tt_move, ply):
+            score = -self._negamax(self._play(gs, move), depth - 1, -beta, -alpha, ply + 1)
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not self._is_capture(gs, move):
+                    killers = self.killers[ply]
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    hk = move[:4]
+                    self.history[hk] = self.history.get(hk, 0) + depth * depth
+                break
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self._store(key, depth, _score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    def _quiesce(self, gs, alpha, beta, ply):
+        self._tick()
+        stand_pat = evaluate(gs)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        noisy = [m for m in self._moves(gs) if m[4] or self._is_capture(gs, m)]
+        for move in self._order(gs, noisy, None, ply):
+            score = -self._quiesce(self._play(gs, move), -beta, -alpha, ply + 1)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _store(self, key, depth, score, flag, move):
+        # mate scores arrive node-relative (see _score_to_tt), so a hit at another ply stays correct
+        idx = key & self.tt_mask
+        entry = self.tt[idx]
+        if entry is None or entry[0] != key or entry[1] <= depth:
+            self.tt[idx] = (key, depth, score, flag, move)
+
+    # ---- moves ----
+
+    def _moves(self, gs):
+        moves = []
+        for sq in range(64):
+            piece = gs.board[sq]
+            if piece & COLOR_MASK != gs.turn:
+                continue
+            r, c = divmod(sq, 8)
+            for (r2, c2) in gs.get_valid_moves_for(r, c):
+                if piece & KIND_MASK == PAWN and (r2 == 0 or r2 == 7):
+                    for promo in SEARCH_PROMOS:
+                        moves.append((r, c, r2, c2, promo))
+                else:
+                    moves.append((r, c, r2, c2, 0))
+        return moves
+
+    def _is_capture(self, gs, move):
+        r0, c0, r1, c1, _ = move
+        if gs.board[r1 * 8 + c1]:
+            return True
+        # en passant: pawn moving diagonally onto an empty square
+        return gs.board[r0 * 8 + c0] & KIND_MASK == PAWN and c0 != c1
+
+    def _order(self, gs, moves, tt_move, ply):
+        killers = self.killers[ply] if ply < len(self.killers) else (None, None)
+        board = gs.board
+
+        def score(move):
+            if move == tt_move:
+                return 10_000_000
+            r0, c0, r1, c1, promo = move
+            victim = board[r1 * 8 + c1] & KIND_MASK
+            attacker = board[r0 * 8 + c0] & KIND_MASK
+            if victim or (c0 != c1 and attacker == PAWN):
+                # MVV-LVA (empty target here means en passant)
+                return 1_000_000 + PIECE_VALUES[victim or PAWN] * 10 - PIECE_VALUES[attacker] // 10
+            if promo:
+                return 900_000 + PIECE_VALUES[PROMO_KINDS[promo]]
+            if move == killers[0]:
+                return 800_000
+            if move == killers[1]:
+                return 700_000
+            return self.history.get(move[:4], 0)
+
+        return sorted(moves, key=score, reverse=True)
+
+    def _play(self, gs, move):
+        r0, c0, r1, c1, promo = move
+        child = gs.clone()
+        child.make_move(r0, c0, r1, c1, screen=None, promotion=PROMO_KINDS.get(promo))
+        return child
@@ -0,0 +1,142 @@
+# rl/analyze.py
+# Batch position analysis: FEN lines in, one JSON line per position out.
+#
+# Positions are evaluated by ChessNet in batches (one forward pass per batch);
+# with --mcts-sim > 0 each position is additionally searched by a shallow MCTS
+# and the moves are ranked by visit count. Move generation can be spread over
+# worker processes with --workers, which keeps the network busy on large inputs.
+#
+#   python -m rl.analyze --model model.pt positions.fen > labels.jsonl
+#   cat positions.fen | python -m rl.analyze --model model.pt --top-k 3
+import argparse
+import functools
+import itertools
+import json
+import multiprocessing as mp
+import os
+import sys
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # game_state imports pygame; keep stdout pure JSON
+
+import numpy as np
+import torch
+
+from rules import is_in_check
+
+from .notation import parse_fen
+from .rl_env import ChessEnv
+from .rl_mcts import MCTS
+from .rl_net import ChessNet
+from .rl_pretrain import read_fens
+from .rl_utils import action_to_uci
+
+
+def prepare(fen, canonical=False):
+    """FEN -> (fen, env, obs, legal actions), or (fen, error message) if it cannot be parsed."""
+    try:
+        env = ChessEnv(parse_fen(fen), canonical=canonical)
+    except ValueError as e:
+        return fen, str(e)
+    return fen, env, env._get_obs(), np.array(env.legal_action_indices(), dtype=np.int64)
+
+
+def analyze(fens, net, batch_size=256, top_k=5, mcts_sim=0, workers=0, canonical=False):
+    """
+    Yields one result dict per FEN, in input order:
+    {"fen", "value", "moves": [{"move", "prior"[, "visits"]}, ...]} with the
+    value from the side to move's point of view, or {"fen", "error"}.
+    workers > 0 prepares positions in that many processes.
+    canonical: the net was trained on side-to-move encoded positions (see ChessEnv).
+    """
+    net.eval()
+    device = next(net.parameters()).device
+    pool = mp.Pool(workers) if workers > 0 else None
+    job = functools.partial(prepare, canonical=canonical)
+    prepared = pool.imap(job, fens, chunksize=64) if pool else map(job, fens)
+    try:
+        while True:
+            chunk = list(itertools.islice(prepared, batch_size))
+            if not chunk:
+                break
+            yield from _analyze_batch(chunk, net, device, top_k, mcts_sim)
+    finally:
+        if pool:
+            pool.terminate()
+
+
+def _analyze_batch(chunk, net, device, top_k, mcts_sim):
+    ok = [item for item in chunk if len(item) == 4 and len(item[3])]
+    if ok:
+        # one forward pass for the batch, with policy logits for the legal moves only
+        lengths = [len(item[3]) for item in ok]
+        x = torch.from_numpy(np.stack([item[2] for item in ok])).to(device)
+        rows = torch.from_numpy(np.repeat(np.arange(len(ok)), lengths)).to(device)
+        actions = torch.from_numpy(np.concatenate([item[3] for item in ok])).to(device)
+        with torch.inference_mode():
+            logits, values = net.forward_pairs(x, rows, actions)
+        logits = np.split(logits.cpu().numpy(), np.cumsum(lengths)[:-1])
+        values = values.cpu().numpy()
+    evaluated = {id(item): i for i, item in enumerate(ok)}
+
+    for item in chunk:
+        if len(item) == 2:
+            yield {"fen": item[0], "error": item[1]}
+            continue
+        fen, env, _, legal = item
+        if not len(legal):
+            mated = is_in_check(env.gs.board, env.gs.turn)
+            yield {"fen": fen, "value": -1.0 if mated else 0.0, "moves": [],
+                   "terminal": "checkmate" if mated else "stalemate"}
+            continue
+
+        i = evaluated[id(item)]
+        row = logits[i]
+        priors = np.exp(row - row.max())
+        priors /= priors.sum()
+        value = float(values[i])
+        visits = None
+        if mcts_sim > 0:
+            mcts = MCTS(net, n_sim=mcts_sim)
+            visits = mcts.run(env)[legal]
+            value = mcts.root_value(env)
+
+        order = np.lexsort((-priors, -visits) if visits is not None else (-priors,))[:top_k]
+        moves = []
+        for j in order:
+            move = {"move": action_to_uci(env.to_real_action(int(legal[j]))), "prior": round(float(priors[j]), 5)}
+            if visits is not None:
+                move["visits"] = int(visits[j])
+            moves.append(move)
+        yield {"fen": fen, "value": round(value, 5), "moves": moves}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate FEN positions with ChessNet")
+    parser.add_argument("input", nargs="?", default="-", help="file of FEN lines (optionally .gz / .bz2), - for stdin")
+    parser.add_argument("--model", default=None, help="ChessNet weights (random init if omitted)")
+    parser.add_argument("--output", default="-", help="JSON lines output file, - for stdout")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--mcts-sim", type=int, default=0, help="MCTS simulations per position (0 = raw net)")
+    parser.add_argument("--workers", type=int, default=0, help="processes for FEN parsing / move generation")
+    parser.add_argument("--canonical", action="store_true", help="net uses the side-to-move encoding")
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    net = ChessNet()
+    if args.model:
+        net.load_state_dict(torch.load(args.model, map_location="cpu"))
+    net.to(device)
+
+    fens = (fen for fen, _ in read_fens(args.input))
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for result in analyze(fens, net, args.batch_size, args.top_k, args.mcts_sim, args.workers, args.canonical):
+            out.write(json.dumps(result) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
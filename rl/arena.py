@@ -0,0 +1,174 @@
+# rl/arena.py
+# Head-to-head matches between two players, played in parallel processes.
+#
+# A player is a ChessNet checkpoint (searched with MCTS) or "alphabeta[:depth]".
+# Games come in pairs from the same random opening with colours swapped, and
+# the match stops as soon as a sequential probability ratio test (SPRT) for
+# "elo0 vs elo1" accepts either hypothesis, or after max_games games.
+#
+#   python -m rl.arena new.pt old.pt --workers 4 --elo0 0 --elo1 20
+import argparse
+import math
+import multiprocessing as mp
+import random
+
+import torch
+
+from .alphabeta import AlphaBetaBot
+from .notation import STARTING_FEN, parse_fen
+from .rl_env import ChessEnv
+from .rl_mcts import MCTS
+from .rl_net import ChessNet
+from .rl_train import play_game
+
+PRIOR_GAMES = 0.5  # pseudo-games added to each of W/D/L, keeping the variance of one-sided results positive
+_players = None  # per worker process: (make_bot_a, make_bot_b, max_moves, opening_plies, canonical)
+
+
+def bot_factory(spec, mcts_sim=50):
+    """Returns a callable creating a fresh bot for `spec` (the network is loaded only once)."""
+    if spec.startswith("alphabeta"):
+        depth = int(spec.split(":")[1]) if ":" in spec else 4
+        return lambda: AlphaBetaBot(max_depth=depth)
+    net = ChessNet()
+    net.load_state_dict(torch.load(spec, map_location="cpu"))
+    net.eval()
+    return lambda: MCTS(net, n_sim=mcts_sim)
+
+
+def random_opening(plies, seed):
+    """`plies` random legal moves from the start position (shorter if the game would end)."""
+    rng = random.Random(seed)
+    env = ChessEnv(parse_fen(STARTING_FEN))
+    opening = []
+    for _ in range(plies):
+        legal = env.legal_action_indices()
+        action = rng.choice(legal)
+        trial = env.clone()
+        if trial.step(action)[2]:
+            break
+        env.step(action)
+        opening.append(action)
+    return opening
+
+
+def _init_worker(spec_a, spec_b, mcts_sim, max_moves, opening_plies, canonical):
+    global _players
+    torch.set_num_threads(1)
+    _players = (bot_factory(spec_a, mcts_sim), bot_factory(spec_b, mcts_sim), max_moves, opening_plies, canonical)
+
+
+def _play(game):
+    """Game `game` of the match; A is White in even games. Returns (game, score of A)."""
+    make_a, make_b, max_moves, opening_plies, canonical = _players
+    opening = random_opening(opening_plies, seed=game // 2)
+    if game % 2 == 0:
+        return game, play_game(make_a(), make_b(), max_moves, opening, canonical)
+    return game, 1.0 - play_game(make_b(), make_a(), max_moves, opening, canonical)
+
+
+def _score_stats(wins, draws, losses):
+    """Game count, mean score and per-game score variance, with PRIOR_GAMES of each result mixed in."""
+    wins, draws, losses = (x + PRIOR_GAMES for x in (wins, draws, losses))
+    n = wins + draws + losses
+    score = (wins + 0.5 * draws) / n
+    var = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    return n, score, var
+
+
+def elo_estimate(wins, draws, losses):
+    """Elo difference and half width of its 95% confidence interval (from the score's standard error)."""
+    if wins + draws + losses == 0:
+        return 0.0, math.inf
+    n, score, var = _score_stats(wins, draws, losses)
+    margin = 1.96 * math.sqrt(var / n)
+    low, high = _elo(score - margin), _elo(score + margin)
+    return _elo(score), (high - low) / 2
+
+
+def _elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def _expected(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """Log-likelihood ratio of H1 (elo1) vs H0 (elo0), normal approximation on the trinomial score."""
+    if wins + draws + losses == 0:
+        return 0.0
+    n, score, var = _score_stats(wins, draws, losses)
+    s0, s1 = _expected(elo0), _expected(elo1)
+    return (s1 - s0) * (2 * score - s0 - s1) / (2 * var / n)
+
+
+def sprt_bounds(alpha=0.05, beta=0.05):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def run_match(spec_a, spec_b, max_games=400, workers=None, mcts_sim=50, max_moves=300, opening_plies=4,
+              elo0=0.0, elo1=20.0, alpha=0.05, beta=0.05, verbose=True, canonical=False):
+    """
+    Plays A against B until the SPRT decides or max_games are played.
+    canonical: both networks use the side-to-move encoding (see ChessEnv).
+    Returns a dict with the W/D/L counts (A's view), Elo estimate, error bar, LLR and decision
+    ("H1": A is stronger by about elo1, "H0": not, None: undecided).
+    """
+    workers = workers or mp.cpu_count()
+    lower, upper = sprt_bounds(alpha, beta)
+    wins = draws = losses = 0
+    llr, decision = 0.0, None
+
+    pool = mp.Pool(workers, _init_worker, (spec_a, spec_b, mcts_sim, max_moves, opening_plies, canonical))
+    try:
+        for _, score in pool.imap_unordered(_play, range(max_games)):
+            if score == 1.0:
+                wins += 1
+            elif score == 0.0:
+                losses += 1
+            else:
+                draws += 1
+            llr = sprt_llr(wins, draws, losses, elo0, elo1)
+            if verbose:
+                elo, err = elo_estimate(wins, draws, losses)
+                print(f"Games {wins + draws + losses}: +{wins} ={draws} -{losses} "
+                      f"Elo {elo:+.1f} +/- {err:.1f} LLR {llr:.2f} [{lower:.2f}, {upper:.2f}]")
+            if llr >= upper or llr <= lower:
+                decision = "H1" if llr >= upper else "H0"
+                break
+    finally:
+        pool.terminate()
+        pool.join()
+
+    elo, err = elo_estimate(wins, draws, losses)
+    return {"wins": wins, "draws": draws, "losses": losses, "elo": elo, "error": err,
+            "llr": llr, "decision": decision}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match two players with SPRT early stopping")
+    parser.add_argument("player_a", help="ChessNet checkpoint, or alphabeta[:depth]")
+    parser.add_argument("player_b", help="ChessNet checkpoint, or alphabeta[:depth]")
+    parser.add_argument("--games", type=int, default=400, help="maximum number of games")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--mcts-sim", type=int, default=50)
+    parser.add_argument("--max-moves", type=int, default=300)
+    parser.add_argument("--opening-plies", type=int, default=4, help="random plies before each game pair")
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=20.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--canonical", action="store_true", help="networks use the side-to-move encoding")
+    args = parser.parse_args()
+
+    result = run_match(args.player_a, args.player_b, args.games, args.workers, args.mcts_sim, args.max_moves,
+                       args.opening_plies, args.elo0, args.elo1, args.alpha, args.beta, canonical=args.canonical)
+    verdict = {"H1": "accepted H1 (A stronger)", "H0": "accepted H0", None: "no decision"}[result["decision"]]
+    print(f"Final: +{result['wins']} ={result['draws']} -{result['losses']} "
+          f"Elo {result['elo']:+.1f} +/- {result['error']:.1f}, SPRT {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# rl/eval_store.py
+# Persistent network evaluation cache shared by processes through a memory map.
+#
+# File layout: header "<4sIQQ" (b"EVS1", top_k, capacity, count) followed by
+# `capacity` fixed-size slots in an open-addressing hash table:
+#   "<QIf" (position hash, net version, value) + top_k uint16 actions + top_k float16 priors
+# Unused action entries are 0xFFFF; a slot is free while its hash is 0.
+#
+# Readers never lock: a slot is written payload first, hash last, and is never
+# modified afterwards, so a matching hash means a complete entry. Writers
+# serialize on a ".lock" file next to the store (flock, or msvcrt.locking on
+# Windows) and, within a process, on a thread lock. compact() rewrites the
+# table (e.g. dropping old network versions) and renames it into place; other
+# processes notice the new file and re-map it. Windows cannot replace a mapped
+# file, so there compact only while no other process has the store open.
+#
+#   python -m rl.eval_store evals.bin --compact --keep 123456789 --capacity 1048576
+import argparse
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MAGIC = b"EVS1"
+HEADER = struct.Struct("<4sIQQ")
+NO_ACTION = 0xFFFF
+MAX_PROBE = 32
+REOPEN_CHECK = 4096  # lookups between checks whether compaction replaced the file
+
+
+class EvalStore:
+    def __init__(self, path, capacity=1 << 20, top_k=8, max_load=0.75):
+        """Opens the store at `path`, creating it with `capacity` slots (a power of two) if missing."""
+        self.path = path
+        self.max_load = max_load
+        self._lock_file = open(path + ".lock", "a+b")
+        self._thread_lock = threading.Lock()  # the file lock belongs to the open file, not the thread
+        if not os.path.exists(path):
+            with self._locked():
+                if not os.path.exists(path):
+                    self._create(path, capacity, top_k, [])
+        self._open()
+
+    # file handling
+
+    def _open(self):
+        with open(self.path, "r+b") as f:
+            ino = os.fstat(f.fileno()).st_ino
+            mm = mmap.mmap(f.fileno(), 0)
+        magic, top_k, capacity, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an evaluation store")
+        # swapped in as one tuple so that concurrent lookups never mix two files
+        # (the old map is released once no lookup uses it any more)
+        self.table = (mm, struct.Struct(f"<QIf{top_k}H{top_k}e"), capacity)
+        self.top_k = top_k
+        self.ino = ino
+        self.lookups = 0
+
+    def _reopen_if_replaced(self):
+        try:
+            replaced = os.stat(self.path).st_ino != self.ino
+        except FileNotFoundError:
+            return
+        if replaced:
+            self._open()
+
+    @staticmethod
+    def _create(path, capacity, top_k, entries):
+        if capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        slot = struct.Struct(f"<QIf{top_k}H{top_k}e")
+        table = bytearray(HEADER.size + capacity * slot.size)
+        count = 0
+        for key, version, payload in entries:
+            for probe in range(MAX_PROBE):
+                offset = HEADER.size + ((_index(key, version) + probe) & (capacity - 1)) * slot.size
+                if not struct.unpack_from("<Q", table, offset)[0]:
+                    table[offset:offset + slot.size] = payload
+                    count += 1
+                    break
+        HEADER.pack_into(table, 0, MAGIC, top_k, capacity, count)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(table)
+        os.replace(tmp, path)
+
+    def _locked(self):
+        return _FileLock(self._lock_file, self._thread_lock)
+
+    def close(self):
+        self.table[0].close()
+        self._lock_file.close()
+
+    def __len__(self):
+        return HEADER.unpack_from(self.table[0], 0)[3]
+
+    # lookups
+
+    @staticmethod
+    def _find(table, key, version):
+        """Offset of the slot holding (key, version), or of the free slot it would go into, or None."""
+        mm, slot, capacity = table
+        start = _index(key, version)
+        for probe in range(MAX_PROBE):
+            offset = HEADER.size + ((start + probe) & (capacity - 1)) * slot.size
+            k, v = struct.unpack_from("<QI", mm, offset)
+            if k == 0 or (k == key and v == version):
+                return offset
+        return None
+
+    def get(self, key, version):
+        """Returns (value, actions, priors) with the stored top-k moves, or None."""
+        self.lookups += 1
+        if self.lookups % REOPEN_CHECK == 0:
+            self._reopen_if_replaced()
+        key = key or 1
+        table = self.table
+        offset = self._find(table, key, version)
+        if offset is None:
+            return None
+        fields = table[1].unpack_from(table[0], offset)
+        if fields[0] != key:
+            return None
+        k = (len(fields) - 3) // 2
+        actions = np.array(fields[3:3 + k], dtype=np.int64)
+        priors = np.array(fields[3 + k:], dtype=np.float32)
+        used = actions != NO_ACTION
+        return fields[2], actions[used], priors[used]
+
+    def put(self, key, version, value, actions, priors):
+        """Stores the value and the top-k of `priors` over `actions`; False if the store is full."""
+        key = key or 1
+        top = np.argsort(-priors)[:self.top_k]
+        pad = self.top_k - len(top)
+        with self._locked():
+            self._reopen_if_replaced()
+            table = mm, slot, capacity = self.table
+            count = HEADER.unpack_from(mm, 0)[3]
+            if count >= self.max_load * capacity:
+                return False
+            offset = self._find(table, key, version)
+            if offset is None or struct.unpack_from("<Q", mm, offset)[0]:
+                return offset is not None  # probe window full, or already stored
+            payload = slot.pack(key, version, value,
+                                *[int(a) for a in actions[top]], *[NO_ACTION] * pad,
+                                *[float(p) for p in priors[top]], *[0.0] * pad)
+            mm[offset + 8:offset + slot.size] = payload[8:]
+            mm[offset:offset + 8] = payload[:8]  # hash last: publishes the entry
+            HEADER.pack_into(mm, 0, MAGIC, self.top_k, capacity, count + 1)
+        return True
+
+    def compact(self, keep_versions=None, capacity=None):
+        """
+        Rewrites the store keeping only entries of `keep_versions` (all if None),
+        optionally with a new capacity; returns the number of entries kept.
+        """
+        with self._locked():
+            self._reopen_if_replaced()
+            mm, slot, old_capacity = self.table
+            entries = []
+            for i in range(old_capacity):
+                offset = HEADER.size + i * slot.size
+                key, version = struct.unpack_from("<QI", mm, offset)
+                if key and (keep_versions is None or version in keep_versions):
+                    entries.append((key, version, bytes(mm[offset:offset + slot.size])))
+            if fcntl is None:
+                mm.close()  # Windows refuses to replace a mapped file
+            self._create(self.path, capacity or old_capacity, self.top_k, entries)
+            self._open()
+        return len(self)
+
+
+class _FileLock:
+    """Exclusive writer lock: the thread lock first, then the lock file (flock / msvcrt byte lock)."""
+
+    def __init__(self, f, thread_lock):
+        self.f = f
+        self.thread_lock = thread_lock
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+                return
+            self.f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.f.fileno(), msvcrt.LK_LOCK, 1)
+                    return
+                except OSError:  # LK_LOCK gives up after about 10 s; keep waiting
+                    pass
+        except BaseException:
+            self.thread_lock.release()
+            raise
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+            else:
+                self.f.seek(0)
+                msvcrt.locking(self.f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.thread_lock.release()
+
+
+def _index(key, version):
+    return (key ^ (version * 0x9E3779B97F4A7C15)) & 0xFFFFFFFFFFFFFFFF
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or compact an evaluation store")
+    parser.add_argument("path")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--keep", type=int, nargs="*", default=None, help="net versions to keep (default: all)")
+    parser.add_argument("--capacity", type=int, default=None, help="new number of slots (a power of two)")
+    args = parser.parse_args()
+
+    store = EvalStore(args.path)
+    if args.compact:
+        store.compact(set(args.keep) if args.keep is not None else None, args.capacity)
+    print(f"{args.path}: {len(store)} entries, {store.table[2]} slots, top {store.top_k} moves")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,109 +5,123 @@ import pygame
 from settings import WIDTH, HEIGHT, SQUARE_SIZE, FPS
 from board import Board
 from pieces import MoveGenerator
+from encoding import (EMPTY, PAWN, QUEEN, KING, KIND_MASK, COLOR_MASK, WHITE, KIND_CODES, ALL_CASTLING,
+                      CASTLING_LOST, from_string_board, to_string_board)
+
+from .zobrist import position_hash
 
 
 class GameState:
+    __slots__ = ("board_obj", "board", "turn", "castling", "en_passant_target", "selected", "valid_moves",
+                 "movegen", "halfmove_clock", "history")
+
     def __init__(self):
         self.board_obj = Board()
-        self.board = self.board_obj.board
-        self.turn = "w"
+        self.board = self.board_obj.board  # flat bytearray of piece codes, index r * 8 + c
+        self.turn = WHITE
 
-        self.has_moved = {
-            "wking": False, "bking": False,
-            "wrook_k": False, "wrook_q": False,
-            "brook_k": False, "brook_q": False
-        }
+        self.castling = ALL_CASTLING  # rights bitmask, see encoding.py
 
         self.en_passant_target = None
         self.selected = None
         self.valid_moves = []
         self.movegen = MoveGenerator()
 
+        # plies since the last capture or pawn move, and position hashes of the game so far
+        self.halfmove_clock = 0
+        self.history = [position_hash(self)]
+
     def reset(self):
         self.board_obj.reset()
         self.board = self.board_obj.board
-        self.turn = "w"
-        for k in self.has_moved:
-            self.has_moved[k] = False
+        self.turn = WHITE
+        self.castling = ALL_CASTLING
         self.en_passant_target = None
         self.selected = None
         self.valid_moves = []
+        self.halfmove_clock = 0
+        self.history = [position_hash(self)]
+
+    def string_board(self):
+        """Board as an 8x8 list of strings like "wking" / ""."""
+        return to_string_board(self.board)
+
+    def set_string_board(self, board):
+        self.board[:] = from_string_board(board)
+        self.history = [position_hash(self)]
 
     def pos_to_rc(self, pos):
         x, y = pos
         return y // SQUARE_SIZE, x // SQUARE_SIZE
 
     def get_valid_moves_for(self, r, c):
-        return self.movegen.legal_moves_safe(self.board, r, c, self.en_passant_target, self.has_moved)
+        return self.movegen.legal_moves_safe(self.board, r, c, self.en_passant_target, self.castling)
 
-    def make_move(self, r0, c0, r, c, screen=None):
-        piece = self.board[r0][c0]
+    def make_move(self, r0, c0, r, c, screen=None, promotion=None):
+        """promotion: kind code (encoding.QUEEN, ...) for pawn promotions; defaults to a queen."""
+        board = self.board
+        fr, to = r0 * 8 + c0, r * 8 + c
+        piece = board[fr]
         if not piece:
             return False
 
-        color = piece[0]
-        kind = piece[1:]
+        color = piece & COLOR_MASK
+        kind = piece & KIND_MASK
+        irreversible = kind == PAWN or board[to] != EMPTY
 
         # en passant capture
-        if kind == "pawn" and self.en_passant_target and (r, c) == self.en_passant_target and c != c0 and self.board[r][c] == "":
-            direction = -1 if color == "w" else 1
-            captured_r = r - direction
-            self.board[captured_r][c] = ""
+        if kind == PAWN and self.en_passant_target and (r, c) == self.en_passant_target and c != c0 and board[to] == EMPTY:
+            direction = -1 if color == WHITE else 1
+            board[to - direction * 8] = EMPTY
 
         # castling rook move
-        if kind == "king" and abs(c - c0) == 2:
+        if kind == KING and abs(c - c0) == 2:
             if c == 6:  # king side
-                self.board[r][5] = self.board[r][7]
-                self.board[r][7] = ""
-                if color == "w":
-                    self.has_moved["wrook_k"] = True
-                else:
-                    self.has_moved["brook_k"] = True
+                board[to - 1] = board[to + 1]
+                board[to + 1] = EMPTY
             elif c == 2:  # queen side
-                self.board[r][3] = self.board[r][0]
-                self.board[r][0] = ""
-                if color == "w":
-                    self.has_moved["wrook_q"] = True
-                else:
-                    self.has_moved["brook_q"] = True
+                board[to + 1] = board[to - 2]
+                board[to - 2] = EMPTY
 
         # move piece
-        self.board[r][c] = self.board[r0][c0]
-        self.board[r0][c0] = ""
+        board[to] = piece
+        board[fr] = EMPTY
 
         # promotion
-        if kind == "pawn" and ((color == "w" and r == 0) or (color == "b" and r == 7)):
-            choice = "queen"
+        if kind == PAWN and (r == 0 or r == 7):
+            choice = promotion or QUEEN
             if screen is not None:
-                choice = self.show_promotion_menu(screen, color) or "queen"
-            self.board[r][c] = color + choice
-
-        # update has_moved
-        if kind == "king":
-            self.has_moved[color + "king"] = True
-        elif kind == "rook":
-            if color == "w":
-                if r0 == 7 and c0 == 0:
-                    self.has_moved["wrook_q"] = True
-                if r0 == 7 and c0 == 7:
-                    self.has_moved["wrook_k"] = True
-            else:
-                if r0 == 0 and c0 == 0:
-                    self.has_moved["brook_q"] = True
-                if r0 == 0 and c0 == 7:
-                    self.has_moved["brook_k"] = True
+                name = self.show_promotion_menu(screen, color)
+                choice = KIND_CODES[name] if name else QUEEN
+            board[to] = color | choice
+
+        # king or rook leaving (or rook captured on) its home square drops castling rights
+        self.castling &= ~(CASTLING_LOST[fr] | CASTLING_LOST[to])
 
         # update en_passant_target
-        if kind == "pawn" and abs(r - r0) == 2:
+        if kind == PAWN and abs(r - r0) == 2:
             self.en_passant_target = ((r + r0) // 2, c)
         else:
             self.en_passant_target = None
 
         # switch turn
-        self.turn = "b" if self.turn == "w" else "w"
+        self.turn ^= COLOR_MASK
+
+        self.halfmove_clock = 0 if irreversible else self.halfmove_clock + 1
+        self.history.append(position_hash(self))
         return True
 
+    def repetition_count(self):
+        """How many times the current position has occurred (only since the last irreversible move)."""
+        recent = self.history[-(self.halfmove_clock + 1):]
+        return recent.count(recent[-1])
+
+    def is_threefold_repetition(self):
+        return self.repetition_count() >= 3
+
+    def is_fifty_move_draw(self):
+        return self.halfmove_clock >= 100
+
     def show_promotion_menu(self, screen, color):
         opts = ["queen", "rook", "bishop", "knight"]
         menu_w = SQUARE_SIZE * 4
@@ -130,7 +144,7 @@ class GameState:
                 y = menu_y
                 rect = pygame.Rect(x, y, SQUARE_SIZE, SQUARE_SIZE)
                 rects.append((rect, opt))
-                key = color + opt
+                key = color | KIND_CODES[opt]
                 img = self.board_obj.piece_images.get(key)
                 if img:
                     screen.blit(img, (x, y))
@@ -151,15 +165,33 @@ class GameState:
                 if ev.type == pygame.KEYDOWN and ev.key == pygame.K_ESCAPE:
                     return None
 
+    @classmethod
+    def from_position(cls, board, turn, castling, en_passant_target=None, halfmove_clock=0):
+        """Headless state (no Board / images) for a given position, e.g. one read from a FEN."""
+        new = cls.__new__(cls)
+        new.board_obj = None
+        new.board = bytearray(board)
+        new.turn = turn
+        new.castling = castling
+        new.en_passant_target = en_passant_target
+        new.selected = None
+        new.valid_moves = []
+        new.movegen = MoveGenerator()
+        new.halfmove_clock = halfmove_clock
+        new.history = [position_hash(new)]
+        return new
+
     def clone(self):
         # lightweight clone for MCTS (no image loading)
         new = GameState.__new__(GameState)
         new.board_obj = None
-        new.board = [row[:] for row in self.board]
+        new.board = bytearray(self.board)
         new.turn = self.turn
-        new.has_moved = self.has_moved.copy()
+        new.castling = self.castling
         new.en_passant_target = self.en_passant_target
         new.selected = None
         new.valid_moves = []
         new.movegen = self.movegen
+        new.halfmove_clock = self.halfmove_clock
+        new.history = self.history[:]
         return new
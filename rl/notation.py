@@ -0,0 +1,130 @@
+# rl/notation.py
+# FEN positions and SAN moves <-> GameState / action indices.
+import re
+
+from rules import is_in_check
+from encoding import (EMPTY, PAWN, ROOK, BISHOP, KNIGHT, QUEEN, KING, KIND_MASK, COLOR_MASK, WHITE, BLACK,
+                      WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE)
+
+from .game_state import GameState
+from .rl_utils import action_to_index, square_name, parse_square
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+PIECE_LETTERS = {PAWN: "p", ROOK: "r", BISHOP: "b", KNIGHT: "n", QUEEN: "q", KING: "k"}
+LETTER_KINDS = {v: k for k, v in PIECE_LETTERS.items()}
+CASTLING_LETTERS = ((WHITE_KINGSIDE, "K"), (WHITE_QUEENSIDE, "Q"), (BLACK_KINGSIDE, "k"), (BLACK_QUEENSIDE, "q"))
+SAN_PROMOS = {"Q": 1, "R": 2, "B": 3, "N": 4}  # action promo codes, see rl_utils
+
+SAN_RE = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([QRBN]))?$")
+
+
+def parse_fen(fen):
+    """
+    FEN string -> headless GameState; the move number field is accepted but not kept.
+    Raises ValueError for malformed FENs and for impossible positions: not exactly one
+    king per side, pawns on the first or eighth rank, or the side not to move in check.
+    """
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError(f"bad FEN: {fen!r}")
+    placement, side, rights, ep = fields[:4]
+
+    rows = placement.split("/")
+    if len(rows) != 8:
+        raise ValueError(f"bad FEN: {fen!r}")
+    board = bytearray(64)
+    for r, row in enumerate(rows):
+        c = 0
+        for ch in row:
+            if ch.isdigit():
+                c += int(ch)
+            elif ch.lower() in LETTER_KINDS and c < 8:
+                board[r * 8 + c] = (WHITE if ch.isupper() else BLACK) | LETTER_KINDS[ch.lower()]
+                c += 1
+            else:
+                raise ValueError(f"bad FEN: {fen!r}")
+        if c != 8:
+            raise ValueError(f"bad FEN: {fen!r}")
+
+    if side not in ("w", "b"):
+        raise ValueError(f"bad FEN: {fen!r}")
+    if board.count(WHITE | KING) != 1 or board.count(BLACK | KING) != 1:
+        raise ValueError(f"bad FEN, need exactly one king per side: {fen!r}")
+    if any(board[sq] & KIND_MASK == PAWN for sq in (*range(8), *range(56, 64))):
+        raise ValueError(f"bad FEN, pawn on the first or eighth rank: {fen!r}")
+    if is_in_check(board, BLACK if side == "w" else WHITE):
+        raise ValueError(f"bad FEN, the side not to move is in check: {fen!r}")
+    castling = 0
+    for bit, letter in CASTLING_LETTERS:
+        if letter in rights:
+            castling |= bit
+    en_passant = divmod(parse_square(ep), 8) if ep != "-" else None
+    halfmove = int(fields[4]) if len(fields) > 4 else 0
+
+    return GameState.from_position(board, WHITE if side == "w" else BLACK, castling, en_passant, halfmove)
+
+
+def to_fen(gs, fullmove=1):
+    rows = []
+    for r in range(8):
+        row, empty = "", 0
+        for c in range(8):
+            p = gs.board[r * 8 + c]
+            if p == EMPTY:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            letter = PIECE_LETTERS[p & KIND_MASK]
+            row += letter.upper() if p & COLOR_MASK == WHITE else letter
+        rows.append(row + (str(empty) if empty else ""))
+
+    rights = "".join(letter for bit, letter in CASTLING_LETTERS if gs.castling & bit) or "-"
+    ep = square_name(gs.en_passant_target[0] * 8 + gs.en_passant_target[1]) if gs.en_passant_target else "-"
+    side = "w" if gs.turn == WHITE else "b"
+    return f"{'/'.join(rows)} {side} {rights} {ep} {gs.halfmove_clock} {fullmove}"
+
+
+def san_to_action(gs, san):
+    """
+    SAN move ("Nbd7", "exd5", "e8=Q+", "O-O") -> action index for the side to move.
+    Only pieces of the named kind are move-generated. Raises ValueError if the
+    move is malformed, illegal or ambiguous.
+    """
+    text = san.rstrip("+#!?")
+    color = gs.turn
+    home = 7 if color == WHITE else 0
+
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        kind, file_, rank = KING, 4, home
+        to = home * 8 + (6 if len(text) == 3 else 2)
+        promo = 0
+    else:
+        m = SAN_RE.match(text)
+        if not m:
+            raise ValueError(f"bad SAN move: {san!r}")
+        letter, file_, rank, dest, promo_letter = m.groups()
+        kind = LETTER_KINDS[letter.lower()] if letter else PAWN
+        file_ = "abcdefgh".index(file_) if file_ else None
+        rank = 8 - int(rank) if rank else None
+        to = parse_square(dest)
+        promo = SAN_PROMOS[promo_letter] if promo_letter else 0
+        if kind == PAWN and to // 8 in (0, 7) and not promo:
+            promo = SAN_PROMOS["Q"]
+
+    piece = color | kind
+    found = []
+    for fr in range(64):
+        if gs.board[fr] != piece:
+            continue
+        r, c = divmod(fr, 8)
+        if (file_ is not None and c != file_) or (rank is not None and r != rank):
+            continue
+        if divmod(to, 8) in gs.get_valid_moves_for(r, c):
+            found.append(fr)
+
+    if len(found) != 1:
+        raise ValueError(f"{'ambiguous' if found else 'illegal'} SAN move: {san!r}")
+    return action_to_index(found[0], to, promo)
@@ -0,0 +1,107 @@
+# rl/opening_book.py
+# Compact binary opening book keyed by Zobrist position hash.
+#
+# File layout (little endian):
+#   header: magic b"OBK1", uint32 entry count
+#   entries: (uint64 key, uint32 action index, uint32 weight), sorted by (key, action)
+# Lookups binary-search the memory-mapped file, so nothing is loaded up front.
+import mmap
+import os
+import random
+import struct
+
+from .game_state import GameState
+from .rl_env import ChessEnv
+from .zobrist import position_hash
+
+MAGIC = b"OBK1"
+HEADER = struct.Struct("<4sI")
+ENTRY = struct.Struct("<QII")
+
+
+def build_book(games, path, max_ply=16, min_weight=1):
+    """
+    Builds a book file from recorded games.
+    games: iterable of move lists; each move is (action_index, weight) with the
+    weight usually the MCTS visit count (see self_play_episode(game_record=...)),
+    or a bare action index counted with weight 1.
+    Returns the number of entries written.
+    """
+    weights = {}
+    env = ChessEnv(GameState())
+
+    for moves in games:
+        env.reset()
+        for ply, move in enumerate(moves):
+            if ply >= max_ply:
+                break
+            action, w = move if isinstance(move, tuple) else (move, 1)
+            k = (position_hash(env.gs), int(action))
+            weights[k] = weights.get(k, 0) + int(w)
+            _, _, done, _ = env.step(int(action))
+            if done:
+                break
+
+    entries = sorted((k, a, min(w, 0xFFFFFFFF)) for (k, a), w in weights.items() if w >= min_weight)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(entries)))
+        for e in entries:
+            f.write(ENTRY.pack(*e))
+    os.replace(tmp, path)
+    return len(entries)
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an opening book")
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def _key_at(self, i):
+        return struct.unpack_from("<Q", self._mm, HEADER.size + i * ENTRY.size)[0]
+
+    def probe(self, key):
+        """Returns [(action, weight), ...] stored for `key` (possibly empty)."""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        found = []
+        i = lo
+        while i < self.size:
+            k, a, w = ENTRY.unpack_from(self._mm, HEADER.size + i * ENTRY.size)
+            if k != key:
+                break
+            found.append((a, w))
+            i += 1
+        return found
+
+    def lookup(self, env):
+        """Book moves for the env position, filtered to legal actions (guards against hash collisions)."""
+        entries = self.probe(position_hash(env.gs))
+        if not entries:
+            return []
+        legal = set(env.legal_action_indices())
+        entries = [(env.from_real_action(a), w) for a, w in entries]  # the book stores real-board actions
+        return [(a, w) for a, w in entries if a in legal and w > 0]
+
+    def choose(self, env, greedy=False):
+        """Picks a book move (weighted by visit counts), or None when out of book."""
+        entries = self.lookup(env)
+        if not entries:
+            return None
+        if greedy:
+            return max(entries, key=lambda e: e[1])[0]
+        return random.choices([a for a, _ in entries], weights=[w for _, w in entries])[0]
@@ -0,0 +1,213 @@
+# rl/parallel_mcts.py
+# Multi-core MCTS. Both classes expose run / root_value / select_action like MCTS.
+#
+# RootParallelMCTS: `workers` processes each search the root independently
+# (own net copy, own tree, Dirichlet noise at the root so the trees differ)
+# and the root visit counts are summed.
+# TreeParallelMCTS: `workers` threads share one tree; a virtual loss on the
+# edges being explored steers concurrent simulations apart. Network calls
+# release the GIL, the Python move generation does not.
+#
+#   python -m rl.parallel_mcts --model model.pt --workers 4 --sims 200
+import argparse
+import math
+import multiprocessing as mp
+import random
+import threading
+import time
+
+import numpy as np
+import torch
+
+from .notation import STARTING_FEN, parse_fen
+from .rl_env import ChessEnv
+from .rl_mcts import MCTS
+from .rl_net import ChessNet
+from .rl_train import play_game
+from .tablebase import Tablebase
+from .eval_store import EvalStore
+from .rl_utils import ACTION_SIZE
+
+_search = None  # per worker process MCTS, see _init_root_worker
+
+
+def _init_root_worker(state_dict, cpuct, tablebase_dir, eval_store_path):
+    global _search
+    torch.set_num_threads(1)
+    net = ChessNet()
+    net.load_state_dict(state_dict)
+    net.eval()
+    _search = MCTS(net, cpuct=cpuct, tablebase=Tablebase(tablebase_dir) if tablebase_dir else None,
+                   eval_store=EvalStore(eval_store_path) if eval_store_path else None)
+
+
+def _root_search(args):
+    gs, canonical, n_sim, seed = args
+    env = ChessEnv(gs, _search.tablebase, canonical)
+    _search.clear()
+    _search.add_root_noise(env, np.random.default_rng(seed))
+    counts = _search.run(env, n_sim=max(n_sim - 1, 0))
+    idx = np.flatnonzero(counts)
+    return idx, counts[idx], _search.root_value(env)
+
+
+class RootParallelMCTS:
+    def __init__(self, net, workers=4, cpuct=1.0, n_sim=50, tablebase_dir=None, seed=None, eval_store_path=None):
+        self.workers = workers
+        self.n_sim = n_sim
+        self.rng = random.Random(seed)
+        self.last_value = 0.0
+        state = {k: v.detach().cpu() for k, v in net.state_dict().items()}
+        self.pool = mp.Pool(workers, _init_root_worker, (state, cpuct, tablebase_dir, eval_store_path))
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def run(self, root_env, n_sim=None):
+        """Splits n_sim simulations over the workers; returns the summed root visit counts."""
+        n_sim = self.n_sim if n_sim is None else n_sim
+        per_worker = math.ceil(n_sim / self.workers)
+        gs = root_env.gs.clone()
+        jobs = [(gs, root_env.canonical, per_worker, self.rng.getrandbits(32)) for _ in range(self.workers)]
+
+        counts = np.zeros(ACTION_SIZE, dtype=np.int32)
+        values, weights = [], []
+        for actions, visits, value in self.pool.map(_root_search, jobs):
+            counts[actions] += visits
+            values.append(value)
+            weights.append(visits.sum())
+        self.last_value = float(np.average(values, weights=weights)) if sum(weights) else 0.0
+        return counts
+
+    def root_value(self, root_env):
+        """Visit-weighted mean of the workers' root values from the last run."""
+        return self.last_value
+
+    def select_action(self, env):
+        legal = env.legal_action_indices()
+        if not legal:
+            return None
+        counts = self.run(env)
+        return max(legal, key=lambda a: counts[a])
+
+
+class TreeParallelMCTS(MCTS):
+    def __init__(self, net, workers=4, virtual_loss=1.0, **kwargs):
+        super().__init__(net, **kwargs)
+        self.workers = workers
+        self.virtual_loss = virtual_loss
+        self.lock = threading.Lock()
+
+    def run(self, root_env, n_sim=None, should_stop=None):
+        root_key = self.state_key(root_env)
+        remaining = [self.n_sim if n_sim is None else n_sim]
+
+        def worker():
+            while True:
+                with self.lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                if should_stop is not None and should_stop():
+                    return
+                self._simulate(root_env.clone())
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with self.lock:
+            return self._root_counts(root_key)
+
+    # MCTS._simulate drives the search; these hooks make its tree updates thread-safe
+
+    def _expand(self, key, priors):
+        with self.lock:
+            if key not in self.P:  # another thread may have expanded it meanwhile
+                super()._expand(key, priors)
+
+    def _select(self, key):
+        # the chosen edge counts as visited and lost until the backup corrects it
+        with self.lock:
+            best = super()._select(key)
+            self.N[key][best] += 1
+            self.W[key][best] -= self.virtual_loss
+        return best
+
+    def _backup(self, path, value):
+        with self.lock:
+            for key, i in path:  # take back the virtual loss, then back up as usual
+                self.N[key][i] -= 1
+                self.W[key][i] += self.virtual_loss
+            super()._backup(path, value)
+
+
+def benchmark(net, workers=4, n_sim=200, positions=20, games=0, max_moves=200, seed=0):
+    """
+    Compares single-threaded MCTS with both parallel modes at the same number of
+    simulations: time per move, speedup, agreement of the chosen move with the
+    single-threaded search and, if games > 0, a head-to-head score against it.
+    """
+    rng = random.Random(seed)
+    envs = []
+    env = ChessEnv(parse_fen(STARTING_FEN))
+    while len(envs) < positions:
+        legal = env.legal_action_indices()
+        if not legal or len(env.gs.history) > 60:
+            env = ChessEnv(parse_fen(STARTING_FEN))
+            continue
+        if len(env.gs.history) > 6:
+            envs.append(env.clone())
+        if env.step(rng.choice(legal))[2]:
+            env = ChessEnv(parse_fen(STARTING_FEN))
+
+    def timed(make_bot):
+        bot = make_bot()
+        start = time.perf_counter()
+        moves = [bot.select_action(e) for e in envs]
+        return moves, (time.perf_counter() - start) / len(envs)
+
+    net.eval()
+    base_moves, base_time = timed(lambda: MCTS(net, n_sim=n_sim))
+    print(f"single       {base_time * 1000:8.1f} ms/move")
+
+    root = RootParallelMCTS(net, workers=workers, n_sim=n_sim, seed=seed)
+    modes = [("root", lambda: root), ("tree", lambda: TreeParallelMCTS(net, workers=workers, n_sim=n_sim))]
+    try:
+        for name, make_bot in modes:
+            moves, t = timed(make_bot)
+            agree = np.mean([a == b for a, b in zip(moves, base_moves)])
+            line = f"{name:<6} x{workers:<4} {t * 1000:8.1f} ms/move  speedup {base_time / t:5.2f}  agreement {agree:.0%}"
+            if games:
+                score = 0.0
+                for g in range(games):
+                    single = MCTS(net, n_sim=n_sim)
+                    if g % 2 == 0:
+                        score += play_game(make_bot(), single, max_moves)
+                    else:
+                        score += 1.0 - play_game(single, make_bot(), max_moves)
+                line += f"  score vs single {score:.1f}/{games}"
+            print(line)
+    finally:
+        root.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel MCTS against the single-threaded search")
+    parser.add_argument("--model", default=None, help="ChessNet weights (random init if omitted)")
+    parser.add_argument("--workers", type=int, default=mp.cpu_count())
+    parser.add_argument("--sims", type=int, default=200)
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--games", type=int, default=0, help="head-to-head games per mode")
+    args = parser.parse_args()
+
+    net = ChessNet()
+    if args.model:
+        net.load_state_dict(torch.load(args.model, map_location="cpu"))
+    benchmark(net, args.workers, args.sims, args.positions, args.games)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,26 @@ import torch
 
 from settings import WIDTH, HEIGHT, FPS, SQUARE_SIZE
 from rules import is_in_check
+from encoding import WHITE, BLACK, color_of
 
 from .game_state import GameState
 from .rl_env import ChessEnv
 from .rl_net import ChessNet
 from .rl_mcts import MCTS
-
-
-def play_human_vs_bot(model_path=None, mcts_sim=50):
+from .parallel_mcts import RootParallelMCTS, TreeParallelMCTS
+from .alphabeta import AlphaBetaBot
+from .opening_book import OpeningBook
+from .tablebase import Tablebase
+from .eval_store import EvalStore
+
+
+def play_human_vs_bot(model_path=None, mcts_sim=50, bot="mcts", ab_depth=4, ab_time=2.0, book_path=None,
+                      tablebase_dir=None, workers=1, parallel="tree", eval_store_path=None, canonical=False):
+    """
+    workers > 1 searches on several cores: parallel="tree" (threads) or "root" (processes).
+    eval_store_path: persistent evaluation cache, reused across runs and processes.
+    canonical: the model was trained with the side-to-move encoding (see ChessEnv).
+    """
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Human vs Bot Chess")
@@ -20,16 +32,28 @@ def play_human_vs_bot(model_path=None, mcts_sim=50):
     font = pygame.freetype.SysFont(None, 18)
 
     gs = GameState()          # your custom board-based GameState (NOT python-chess)
-    env = ChessEnv(gs)
-
-    net = ChessNet()
-    if model_path is not None:
-        net.load_state_dict(torch.load(model_path, map_location="cpu"))
-    net.eval()
-
-    mcts = MCTS(net, n_sim=mcts_sim)
-
-    human_color = "w"   # human is white
+    env = ChessEnv(gs, canonical=canonical)
+
+    if bot == "alphabeta":
+        engine = AlphaBetaBot(max_depth=ab_depth, time_limit=ab_time)
+    else:
+        net = ChessNet()
+        if model_path is not None:
+            net.load_state_dict(torch.load(model_path, map_location="cpu"))
+        net.eval()
+        tablebase = Tablebase(tablebase_dir) if tablebase_dir is not None else None
+        store = EvalStore(eval_store_path) if eval_store_path is not None else None
+        if workers > 1 and parallel == "root":
+            engine = RootParallelMCTS(net, workers=workers, n_sim=mcts_sim, tablebase_dir=tablebase_dir,
+                                      eval_store_path=eval_store_path)
+        elif workers > 1:
+            engine = TreeParallelMCTS(net, workers=workers, n_sim=mcts_sim, tablebase=tablebase, eval_store=store)
+        else:
+            engine = MCTS(net, n_sim=mcts_sim, tablebase=tablebase, eval_store=store)
+
+    book = OpeningBook(book_path) if book_path is not None else None
+
+    human_color = WHITE   # human is white
     running = True
 
     while running:
@@ -39,13 +63,13 @@ def play_human_vs_bot(model_path=None, mcts_sim=50):
         gs.board_obj.draw(screen)
 
         # highlight moves
-        if gs.selected and gs.board[gs.selected[0]][gs.selected[1]] and gs.board[gs.selected[0]][gs.selected[1]][0] == gs.turn:
+        if gs.selected and color_of(gs.board[gs.selected[0] * 8 + gs.selected[1]]) == gs.turn:
             for rr, cc in gs.valid_moves:
                 s = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
                 s.fill((50, 205, 50, 100))
                 screen.blit(s, (cc * SQUARE_SIZE, rr * SQUARE_SIZE))
 
-        font.render_to(screen, (5, 5), f"Turn: {'White' if gs.turn=='w' else 'Black'}", (0, 0, 0))
+        font.render_to(screen, (5, 5), f"Turn: {'White' if gs.turn == WHITE else 'Black'}", (0, 0, 0))
         pygame.display.flip()
 
         # human input
@@ -60,7 +84,7 @@ def play_human_vs_bot(model_path=None, mcts_sim=50):
                     continue
 
                 if gs.selected is None:
-                    if gs.board[r][c] != "" and gs.board[r][c][0] == gs.turn:
+                    if color_of(gs.board[r * 8 + c]) == gs.turn:
                         gs.selected = (r, c)
                         gs.valid_moves = gs.get_valid_moves_for(r, c)
                 else:
@@ -72,7 +96,7 @@ def play_human_vs_bot(model_path=None, mcts_sim=50):
                         gs.make_move(r0, c0, r, c, screen)  # promotion UI enabled for human
                         gs.selected = None
                         gs.valid_moves = []
-                    elif gs.board[r][c] != "" and gs.board[r][c][0] == gs.turn:
+                    elif color_of(gs.board[r * 8 + c]) == gs.turn:
                         gs.selected = (r, c)
                         gs.valid_moves = gs.get_valid_moves_for(r, c)
                     else:
@@ -84,33 +108,33 @@ def play_human_vs_bot(model_path=None, mcts_sim=50):
 
         # bot move
         if gs.turn != human_color:
-            legal = env.legal_action_indices()
-            if not legal:
+            best_action = book.choose(env) if book is not None else None
+            if best_action is None:
+                best_action = engine.select_action(env)
+            if best_action is None:
                 running = False
                 break
-
-            counts = mcts.run(env)
-            best_action = max(legal, key=lambda a: counts[a])
             env.step(best_action)
 
         # game over check
         has_any = False
-        for rr in range(8):
-            for cc in range(8):
-                if gs.board[rr][cc] != "" and gs.board[rr][cc][0] == gs.turn:
-                    if gs.get_valid_moves_for(rr, cc):
-                        has_any = True
-                        break
-            if has_any:
-                break
+        for sq in range(64):
+            if color_of(gs.board[sq]) == gs.turn:
+                if gs.get_valid_moves_for(*divmod(sq, 8)):
+                    has_any = True
+                    break
 
         if not has_any:
             if is_in_check(gs.board, gs.turn):
-                print("Checkmate!", "White wins" if gs.turn == "b" else "Black wins")
+                print("Checkmate!", "White wins" if gs.turn == BLACK else "Black wins")
             else:
                 print("Stalemate!")
             running = False
 
+    if book is not None:
+        book.close()
+    if isinstance(engine, RootParallelMCTS):
+        engine.close()
     pygame.quit()
 
 
@@ -0,0 +1,352 @@
+# rl/rl_distributed.py
+# Actor/learner self-play over TCP or Unix sockets.
+#
+# Actors play self_play_episode games and stream the finished records to the
+# learner; the learner trains on its replay buffer and publishes versioned
+# ChessNet weights that actors pull whenever they see a newer version.
+# Actors may join or leave at any time; they reconnect if the learner goes away.
+#
+# Messages are a fixed header (kind, integer argument, payload length) plus a
+# raw payload: game records as an .npz archive of pack_records arrays, weights
+# as a torch.save blob loaded with weights_only. Nothing is unpickled. There is
+# no authentication: the learner listens on localhost unless told otherwise.
+#
+#   python -m rl.rl_distributed learner --bind 0.0.0.0:5555
+#   python -m rl.rl_distributed actor --connect learner-host:5555
+import argparse
+import io
+import multiprocessing as mp
+import os
+import random
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import time
+import zipfile
+from collections import deque
+
+import numpy as np
+import torch
+import torch.optim as optim
+
+from .rl_net import ChessNet
+from .eval_store import EvalStore
+from .rl_train import self_play_episode, train_step, pack_records, unpack_records
+
+HEADER = struct.Struct("!BqQ")  # kind, integer argument (a weights version), payload length
+KINDS = ("hello", "games", "get_weights", "weights", "ok")
+MAX_PAYLOAD = 1 << 30
+RECORD_FIELDS = ("states", "policy_idx", "policy_val", "policy_len", "z")  # see pack_records
+
+
+def send_msg(sock, kind, value=0, payload=b""):
+    sock.sendall(HEADER.pack(KINDS.index(kind), value, len(payload)) + payload)
+
+
+def recv_msg(sock):
+    """
+    Returns the next message as (kind, value, payload bytes), or None once the
+    peer has closed the connection. Raises ValueError on a malformed header.
+    """
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    kind, value, length = HEADER.unpack(header)
+    if kind >= len(KINDS) or length > MAX_PAYLOAD:
+        raise ValueError(f"bad message header (kind {kind}, {length} bytes)")
+    payload = _recv_exact(sock, length)
+    if payload is None:
+        return None
+    return KINDS[kind], value, payload
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def parse_address(text):
+    """"host:port" -> (host, port) for TCP, anything else is a Unix socket path."""
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return text
+
+
+def connect(address):
+    if isinstance(address, tuple):
+        return socket.create_connection(address)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(address)
+    return sock
+
+
+def serialize_weights(net):
+    buf = io.BytesIO()
+    torch.save({k: v.detach().cpu() for k, v in net.state_dict().items()}, buf)
+    return buf.getvalue()
+
+
+def load_weights(net, blob):
+    net.load_state_dict(torch.load(io.BytesIO(blob), map_location="cpu", weights_only=True))
+
+
+def encode_records(packed):
+    buf = io.BytesIO()
+    np.savez(buf, **packed)
+    return buf.getvalue()
+
+
+def decode_records(payload):
+    """Inverse of encode_records; ValueError if the payload is not a records archive."""
+    try:
+        with np.load(io.BytesIO(payload), allow_pickle=False) as archive:
+            return {name: archive[name] for name in RECORD_FIELDS}
+    except (zipfile.BadZipFile, KeyError, OSError) as e:
+        raise ValueError(f"bad game records: {e}") from e
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        learner = self.server.learner
+        actor_id = None
+        try:
+            while True:
+                msg = recv_msg(self.request)
+                if msg is None:
+                    break
+                kind, value, payload = msg
+                if kind == "hello":
+                    actor_id = payload.decode("utf-8", "replace")
+                    learner.actor_joined(actor_id)
+                    send_msg(self.request, "weights", *learner.weights())
+                elif kind == "games":
+                    learner.add_games(unpack_records(decode_records(payload)))
+                    send_msg(self.request, "ok", learner.version)
+                elif kind == "get_weights":
+                    version, blob = learner.weights()
+                    if version == value:
+                        send_msg(self.request, "ok", version)
+                    else:
+                        send_msg(self.request, "weights", version, blob)
+        except (ConnectionError, OSError, ValueError, IndexError):
+            pass  # broken connection or malformed message: drop the actor
+        finally:
+            if actor_id is not None:
+                learner.actor_left(actor_id)
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class Learner:
+    def __init__(self, address, net=None, replay_size=10000, batch_size=64, min_replay=100,
+                 publish_every=20, lr=1e-3):
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.net = (net or ChessNet()).to(self.device)
+        self.optimizer = optim.Adam(self.net.parameters(), lr=lr)
+        self.batch_size = batch_size
+        self.min_replay = min_replay
+        self.publish_every = publish_every
+
+        self.lock = threading.Lock()
+        self.replay = deque(maxlen=replay_size)
+        self.games = 0
+        self.actors = set()
+        self.version = 0
+        self._blob = serialize_weights(self.net)
+
+        if isinstance(address, tuple):
+            self.server = _TCPServer(address, _Handler)
+        else:
+            _remove_stale_socket(address)
+            self.server = _UnixServer(address, _Handler)
+        self.server.learner = self
+        self.address = self.server.server_address
+
+    # called from connection threads
+
+    def actor_joined(self, actor_id):
+        with self.lock:
+            self.actors.add(actor_id)
+        print(f"Actor {actor_id} joined ({len(self.actors)} connected)")
+
+    def actor_left(self, actor_id):
+        with self.lock:
+            self.actors.discard(actor_id)
+        print(f"Actor {actor_id} left ({len(self.actors)} connected)")
+
+    def add_games(self, records):
+        with self.lock:
+            self.replay.extend(records)
+            self.games += 1
+
+    def weights(self):
+        with self.lock:
+            return self.version, self._blob
+
+    # training side
+
+    def publish(self):
+        blob = serialize_weights(self.net)
+        with self.lock:
+            self.version += 1
+            self._blob = blob
+
+    def run(self, num_steps=None, poll=0.5):
+        """Serves actors in the background and trains until num_steps optimizer steps (forever if None)."""
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Learner listening on {self.address}")
+        step = 0
+        try:
+            while num_steps is None or step < num_steps:
+                with self.lock:
+                    ready = len(self.replay) >= self.min_replay
+                    batch = random.sample(self.replay, min(self.batch_size, len(self.replay))) if ready else None
+                if batch is None:
+                    time.sleep(poll)
+                    continue
+
+                loss = train_step(self.net, self.optimizer, batch, self.device)
+                step += 1
+                if step % self.publish_every == 0:
+                    self.publish()
+                    print(f"Step {step}: loss={loss:.4f} replay={len(self.replay)} games={self.games} "
+                          f"actors={len(self.actors)} version={self.version}")
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+            if isinstance(self.address, str):
+                try:
+                    os.unlink(self.address)
+                except FileNotFoundError:
+                    pass
+        return self.net
+
+
+def _remove_stale_socket(path):
+    """Deletes a Unix socket file left behind by a learner that is no longer running."""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+    try:
+        connect(path).close()  # a live learner answers; leave it alone (binding then fails)
+    except ConnectionRefusedError:
+        os.unlink(path)
+
+
+def _request(sock, kind, value=0, payload=b""):
+    send_msg(sock, kind, value, payload)
+    reply = recv_msg(sock)
+    if reply is None:
+        raise ConnectionError("learner closed the connection")
+    return reply
+
+
+def run_actor(address, actor_id=None, games=None, mcts_sim=25, max_moves=400, resign_threshold=None,
+              retry_delay=2.0, eval_store_path=None, canonical=False):
+    """
+    Plays self-play games for the learner at `address`; reconnects whenever the learner is unreachable.
+    eval_store_path: EvalStore file shared by the actors on this machine.
+    canonical: side-to-move encoding (see ChessEnv); all actors of a learner must agree.
+    """
+    actor_id = actor_id or f"{socket.gethostname()}-{mp.current_process().pid}"
+    net = ChessNet()
+    net.eval()
+    store = EvalStore(eval_store_path) if eval_store_path else None
+    version = -1
+    played = 0
+
+    while games is None or played < games:
+        try:
+            with connect(address) as sock:
+                _, version, blob = _request(sock, "hello", payload=actor_id.encode())
+                load_weights(net, blob)
+
+                while games is None or played < games:
+                    latest = version
+                    records = self_play_episode(net, mcts_sim=mcts_sim, max_moves=max_moves,
+                                                resign_threshold=resign_threshold, eval_store=store,
+                                                canonical=canonical)
+                    if records:
+                        latest = _request(sock, "games", payload=encode_records(pack_records(records)))[1]
+                    played += 1
+
+                    if latest != version:
+                        reply = _request(sock, "get_weights", version)
+                        if reply[0] == "weights":
+                            _, version, blob = reply
+                            load_weights(net, blob)
+        except (ConnectionError, OSError):
+            time.sleep(retry_delay)
+    return played
+
+
+def run_local(num_actors=2, num_steps=200, address=("127.0.0.1", 0), **actor_kwargs):
+    """Learner plus `num_actors` actor processes on this machine (for testing the setup)."""
+    learner = Learner(address)
+    actors = [mp.Process(target=run_actor, args=(learner.address, f"local-{i}"), kwargs=actor_kwargs, daemon=True)
+              for i in range(num_actors)]
+    for p in actors:
+        p.start()
+    try:
+        return learner.run(num_steps)
+    finally:
+        for p in actors:
+            p.terminate()
+            p.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed self-play (actor/learner)")
+    sub = parser.add_subparsers(dest="role", required=True)
+
+    lp = sub.add_parser("learner")
+    lp.add_argument("--bind", default="127.0.0.1:5555",
+                    help="host:port or a Unix socket path (0.0.0.0:PORT accepts remote actors)")
+    lp.add_argument("--steps", type=int, default=None)
+    lp.add_argument("--publish-every", type=int, default=20)
+    lp.add_argument("--save", default=None, help="write final weights here")
+
+    ap = sub.add_parser("actor")
+    ap.add_argument("--connect", default="127.0.0.1:5555", help="host:port or a Unix socket path")
+    ap.add_argument("--games", type=int, default=None)
+    ap.add_argument("--mcts-sim", type=int, default=25)
+    ap.add_argument("--max-moves", type=int, default=400)
+    ap.add_argument("--eval-store", default=None, help="evaluation cache file shared by local actors")
+    ap.add_argument("--canonical", action="store_true", help="side-to-move encoding (see ChessEnv)")
+
+    lo = sub.add_parser("local")
+    lo.add_argument("--actors", type=int, default=2)
+    lo.add_argument("--steps", type=int, default=200)
+
+    args = parser.parse_args()
+    if args.role == "learner":
+        net = Learner(parse_address(args.bind), publish_every=args.publish_every).run(args.steps)
+        if args.save:
+            torch.save(net.state_dict(), args.save)
+    elif args.role == "actor":
+        run_actor(parse_address(args.connect), games=args.games, mcts_sim=args.mcts_sim, max_moves=args.max_moves,
+                  eval_store_path=args.eval_store, canonical=args.canonical)
+    else:
+        run_local(args.actors, args.steps)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,90 @@
 # rl/rl_env.py
 import numpy as np
 from rules import is_in_check
+from encoding import PAWN, KIND_MASK, COLOR_MASK, WHITE, BLACK
 
-from .rl_utils import action_to_index, index_to_action
+from .rl_utils import action_to_index, index_to_action, flip_action, PROMO_KINDS
+from .zobrist import canonical_hash
+
+# observation plane indexed by piece code: kinds in the order pawn, rook, bishop,
+# knight, queen, king, with white and black interleaved
+PLANE = np.zeros(32, dtype=np.int64)
+for _kind in range(1, 7):
+    PLANE[WHITE | _kind] = (_kind - 1) * 2
+    PLANE[BLACK | _kind] = (_kind - 1) * 2 + 1
+# the same with colours swapped (the side to move is always on the "white" planes)
+PLANE_SWAPPED = np.zeros(32, dtype=np.int64)
+PLANE_SWAPPED[WHITE:WHITE + 7], PLANE_SWAPPED[BLACK:BLACK + 7] = PLANE[BLACK:BLACK + 7], PLANE[WHITE:WHITE + 7]
 
 
 class ChessEnv:
-    def __init__(self, game_state):
+    def __init__(self, game_state, tablebase=None, canonical=False):
+        """
+        canonical: encode everything from the side to move's point of view. With
+        Black to move the board is mirrored (ranks flipped, colours swapped), the
+        turn plane is constant and actions are mirrored too (rl_utils.flip_action),
+        so colour-mirrored positions share observations, tree nodes and cache entries.
+        legal_action_indices / step then work in that action space; to_real_action
+        converts for move notation and the UI.
+        """
         self.gs = game_state
+        self.tablebase = tablebase
+        self.canonical = canonical
+
+    def flipped(self):
+        return self.canonical and self.gs.turn == BLACK
+
+    def to_real_action(self, action):
+        """Env action -> action on the real board."""
+        return flip_action(action) if self.flipped() else action
+
+    def from_real_action(self, action):
+        """Action on the real board -> env action."""
+        return flip_action(action) if self.flipped() else action
+
+    def position_key(self):
+        """Zobrist key of the position as the env presents it (mirrored when flipped)."""
+        return canonical_hash(self.gs) if self.canonical else self.gs.history[-1]
 
     def reset(self):
         self.gs.reset()
         return self._get_obs()
 
     def _get_obs(self):
-        b = self.gs.board
-        ch_map = ["pawn", "rook", "bishop", "knight", "queen", "king"]
-        obs = np.zeros((13, 8, 8), dtype=np.float32)
-
-        for r in range(8):
-            for c in range(8):
-                p = b[r][c]
-                if not p:
-                    continue
-                color = p[0]
-                kind = p[1:]
-                kind_idx = ch_map.index(kind)
-                ch = kind_idx * 2 + (0 if color == "w" else 1)
-                obs[ch, r, c] = 1.0
-
-        obs[12, :, :] = 1.0 if self.gs.turn == "w" else 0.0
-        return obs
+        squares = np.frombuffer(self.gs.board, dtype=np.uint8)
+        obs = np.zeros((13, 64), dtype=np.float32)
+
+        planes = PLANE
+        if self.flipped():
+            squares = squares.reshape(8, 8)[::-1].ravel()
+            planes = PLANE_SWAPPED
+        occupied = np.flatnonzero(squares)
+        obs[planes[squares[occupied]], occupied] = 1.0
+
+        obs[12] = 1.0 if self.gs.turn == WHITE or self.canonical else 0.0
+        return obs.reshape(13, 8, 8)
 
     def legal_action_indices(self):
         legal = []
-        for r in range(8):
-            for c in range(8):
-                piece = self.gs.board[r][c]
-                if piece and piece[0] == self.gs.turn:
-                    moves = self.gs.get_valid_moves_for(r, c)
-                    for (r2, c2) in moves:
-                        # promotion
-                        if piece[1:] == "pawn" and (r2 == 0 or r2 == 7):
-                            for promo in (1, 2, 3, 4):  # q,r,b,n
-                                legal.append(action_to_index(r * 8 + c, r2 * 8 + c2, promo))
-                        else:
-                            legal.append(action_to_index(r * 8 + c, r2 * 8 + c2, 0))
+        board = self.gs.board
+        for fr in range(64):
+            piece = board[fr]
+            if piece & COLOR_MASK == self.gs.turn:
+                r, c = divmod(fr, 8)
+                moves = self.gs.get_valid_moves_for(r, c)
+                for (r2, c2) in moves:
+                    # promotion
+                    if piece & KIND_MASK == PAWN and (r2 == 0 or r2 == 7):
+                        for promo in (1, 2, 3, 4):  # q,r,b,n
+                            legal.append(action_to_index(fr, r2 * 8 + c2, promo))
+                    else:
+                        legal.append(action_to_index(fr, r2 * 8 + c2, 0))
+        if self.flipped():
+            legal = [flip_action(a) for a in legal]
         return legal
 
     def step(self, action_index):
-        fr, to, promo = index_to_action(action_index)
+        fr, to, promo = index_to_action(self.to_real_action(action_index))
         r0, c0 = divmod(fr, 8)
         r1, c1 = divmod(to, 8)
 
@@ -57,31 +92,36 @@ class ChessEnv:
         if action_index not in legal:
             return self._get_obs(), -1.0, True, {"illegal": True}
 
-        piece = self.gs.board[r0][c0]
-        self.gs.make_move(r0, c0, r1, c1, screen=None)  # RL mode: no UI
-
-        # apply promotion choice (RL)
-        if promo != 0 and piece and piece[1:] == "pawn":
-            pmap = {1: "queen", 2: "rook", 3: "bishop", 4: "knight"}
-            self.gs.board[r1][c1] = piece[0] + pmap[promo]
+        # RL mode: no UI, promotion choice comes from the action
+        self.gs.make_move(r0, c0, r1, c1, screen=None, promotion=PROMO_KINDS.get(promo))
 
         # terminal detection
         has_any = False
-        for rr in range(8):
-            for cc in range(8):
-                if self.gs.board[rr][cc] != "" and self.gs.board[rr][cc][0] == self.gs.turn:
-                    if self.gs.get_valid_moves_for(rr, cc):
-                        has_any = True
-                        break
-            if has_any:
-                break
+        for sq in range(64):
+            if self.gs.board[sq] & COLOR_MASK == self.gs.turn:
+                if self.gs.get_valid_moves_for(*divmod(sq, 8)):
+                    has_any = True
+                    break
 
         if not has_any:
             if is_in_check(self.gs.board, self.gs.turn):
                 return self._get_obs(), 1.0, True, {}
             return self._get_obs(), 0.5, True, {}
 
+        if self.gs.is_threefold_repetition():
+            return self._get_obs(), 0.5, True, {"draw": "repetition"}
+        if self.gs.is_fifty_move_draw():
+            return self._get_obs(), 0.5, True, {"draw": "fifty_move"}
+
+        # adjudicate known endgames (result from the mover's point of view)
+        if self.tablebase is not None:
+            hit = self.tablebase.probe(self.gs.board, self.gs.turn)
+            if hit is not None:
+                wdl, dtm = hit
+                reward = 0.5 if wdl == 0 else (1.0 if wdl < 0 else -1.0)
+                return self._get_obs(), reward, True, {"tablebase": True, "dtm": dtm}
+
         return self._get_obs(), 0.0, False, {}
 
     def clone(self):
-        return ChessEnv(self.gs.clone())
+        return ChessEnv(self.gs.clone(), self.tablebase, self.canonical)
@@ -1,75 +1,177 @@
 # rl/rl_mcts.py
 import math
-from collections import defaultdict
 
 import numpy as np
 import torch
 
+from rules import is_in_check
+
 from .rl_utils import ACTION_SIZE
+from .rl_net import net_version as weights_version
 
 
 class MCTS:
-    def __init__(self, net, cpuct=1.0, n_sim=50):
+    def __init__(self, net, cpuct=1.0, n_sim=50, tablebase=None, eval_store=None, net_version=None):
+        """
+        eval_store: optional EvalStore consulted before every network call; its
+        entries are keyed by position hash and net_version (by default a
+        fingerprint of the current weights).
+        """
         self.net = net
         self.cpuct = cpuct
         self.n_sim = n_sim
-
-        self.P = {}  # priors: P[state][a]
-        self.N = defaultdict(lambda: defaultdict(int))
-        self.W = defaultdict(lambda: defaultdict(float))
-        self.Q = defaultdict(lambda: defaultdict(float))
-
-    def state_key(self, obs):
-        return obs.tobytes()
-
-    def run(self, root_env):
-        root_obs = root_env._get_obs()
-        root_key = self.state_key(root_obs)
-
-        for _ in range(self.n_sim):
+        self.tablebase = tablebase
+        self.eval_store = eval_store
+        if eval_store is not None and net_version is None:
+            net_version = weights_version(net)
+        self.net_version = net_version
+
+        # per state, arrays aligned with the state's legal actions A[state]:
+        # priors P, visit counts N and total values W (Q = W / N)
+        self.A = {}
+        self.P = {}
+        self.N = {}
+        self.W = {}
+
+    def state_key(self, env):
+        # Zobrist key: unlike the observation it covers castling rights and the en passant square
+        return env.position_key()
+
+    def clear(self):
+        """Drops the search tree (it is otherwise kept and reused across run calls)."""
+        self.A.clear()
+        self.P.clear()
+        self.N.clear()
+        self.W.clear()
+
+    def run(self, root_env, n_sim=None, should_stop=None):
+        """
+        Runs n_sim simulations (self.n_sim by default) from root_env and returns the
+        root visit counts. should_stop: optional callable checked before every
+        simulation, ending the search early when it returns True.
+        """
+        root_key = self.state_key(root_env)
+
+        for _ in range(self.n_sim if n_sim is None else n_sim):
+            if should_stop is not None and should_stop():
+                break
             env = root_env.clone()
             self._simulate(env)
+        return self._root_counts(root_key)
 
+    def _root_counts(self, root_key):
         counts = np.zeros(ACTION_SIZE, dtype=np.int32)
-        for a in root_env.legal_action_indices():
-            counts[a] = self.N[root_key][a]
+        if root_key in self.N:
+            counts[self.A[root_key]] = self.N[root_key]
         return counts
 
+    def add_root_noise(self, root_env, rng, alpha=0.3, eps=0.25):
+        """Mixes Dirichlet noise into the root priors (expanding the root first if needed)."""
+        key = self.state_key(root_env)
+        if key not in self.P:
+            self._simulate(root_env.clone())
+        if key in self.P and len(self.P[key]):
+            noise = rng.dirichlet([alpha] * len(self.P[key]))
+            self.P[key] = ((1 - eps) * self.P[key] + eps * noise).astype(np.float32)
+
+    def root_value(self, root_env):
+        """Q of the most visited root action, i.e. the search's estimate for the side to move."""
+        key = self.state_key(root_env)
+        visits = self.N.get(key)
+        if visits is None or not visits.any():
+            return 0.0
+        best = int(np.argmax(visits))
+        return float(self.W[key][best] / visits[best])
+
+    def select_action(self, env):
+        legal = env.legal_action_indices()
+        if not legal:
+            return None
+        counts = self.run(env)
+        return max(legal, key=lambda a: counts[a])
+
+    def _evaluate(self, obs, actions):
+        """Network priors over `actions` only (masked softmax) and the value of `obs`."""
+        param = next(self.net.parameters())
+        x = torch.from_numpy(obs).unsqueeze(0).to(param.device)
+        idx = torch.from_numpy(actions).to(param.device)
+        with torch.no_grad():
+            logits, v = self.net.forward_legal(x, idx)
+            priors = torch.softmax(logits.squeeze(0), dim=-1).cpu().numpy()
+        return priors, float(v.item())
+
+    def _evaluate_leaf(self, env, actions):
+        """_evaluate of env's position, answered from / recorded in the eval store when there is one."""
+        if self.eval_store is None:
+            return self._evaluate(env._get_obs(), actions)
+        key = env.position_key()
+        hit = self.eval_store.get(key, self.net_version)
+        if hit is not None:
+            value, top, top_priors = hit
+            rows, cols = np.nonzero(actions[:, None] == top[None, :])
+            if len(cols) == len(top):  # else a hash collision: evaluate normally
+                # the store keeps the top-k priors; the rest is spread evenly
+                rest = len(actions) - len(top)
+                priors = np.full(len(actions), max(1.0 - top_priors.sum(), 0.0) / max(rest, 1), dtype=np.float32)
+                priors[rows] = top_priors[cols]
+                return priors, value
+        priors, value = self._evaluate(env._get_obs(), actions)
+        self.eval_store.put(key, self.net_version, value, actions, priors)
+        return priors, value
+
     def _simulate(self, env):
         path = []
 
         while True:
-            obs = env._get_obs()
-            key = self.state_key(obs)
-            legal = env.legal_action_indices()
-
-            if not legal:
-                value = 0.0
+            key = self.state_key(env)
+            actions = self.A.get(key)
+            if actions is None:
+                actions = self.A.setdefault(key, np.array(env.legal_action_indices(), dtype=np.int64))
+
+            if len(actions) == 0:
+                # checkmated or stalemated side to move
+                value = -1.0 if is_in_check(env.gs.board, env.gs.turn) else 0.0
                 break
 
+            # exact endgame value: treat as a terminal leaf (below the root, which must be expanded)
+            if self.tablebase is not None and path:
+                hit = self.tablebase.probe(env.gs.board, env.gs.turn)
+                if hit is not None:
+                    value = hit[0] * (1.0 - 0.001 * hit[1])  # prefer faster wins, slower losses
+                    break
+
             if key not in self.P:
-                x = torch.tensor(obs, dtype=torch.float32).unsqueeze(0)
-                with torch.no_grad():
-                    logits, v = self.net(x)
-                    probs = torch.softmax(logits, dim=-1).squeeze(0).cpu().numpy()
-                    value = float(v.item())
-                self.P[key] = {a: float(probs[a]) for a in legal}
+                priors, value = self._evaluate_leaf(env, actions)
+                self._expand(key, priors)
+                break
+
+            best = self._select(key)
+            path.append((key, best))
+            _, _, done, info = env.step(int(actions[best]))
+            if done and ("draw" in info or "illegal" in info):
+                # "illegal" only on a Zobrist key collision
+                value = 0.0
                 break
 
-            total_N = sum(self.N[key][a] for a in legal) + 1
-            best_a, best_score = None, -1e9
-            for a in legal:
-                q = self.Q[key].get(a, 0.0)
-                p = self.P[key].get(a, 1e-8)
-                u = q + self.cpuct * p * math.sqrt(total_N) / (1 + self.N[key][a])
-                if u > best_score:
-                    best_score, best_a = u, a
-
-            path.append((key, best_a))
-            env.step(best_a)
-
-        for key, a in reversed(path):
-            self.N[key][a] += 1
-            self.W[key][a] += value
-            self.Q[key][a] = self.W[key][a] / self.N[key][a]
+        self._backup(path, value)
+
+    # tree updates, overridden by TreeParallelMCTS to add locking and virtual loss
+
+    def _expand(self, key, priors):
+        self.P[key] = priors
+        self.N[key] = np.zeros(len(priors), dtype=np.int32)
+        self.W[key] = np.zeros(len(priors), dtype=np.float32)
+
+    def _select(self, key):
+        """PUCT choice at an expanded state, as an index into A[key]."""
+        n = self.N[key]
+        q = self.W[key] / np.maximum(n, 1)
+        u = q + self.cpuct * self.P[key] * math.sqrt(n.sum() + 1) / (1 + n)
+        return int(np.argmax(u))
+
+    def _backup(self, path, value):
+        # value is for the side to move at the leaf; each edge is scored for the side choosing it
+        for key, i in reversed(path):
             value = -value
+            self.N[key][i] += 1
+            self.W[key][i] += value
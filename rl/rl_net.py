@@ -1,4 +1,6 @@
 # rl/rl_net.py
+import zlib
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -42,9 +44,47 @@ class ChessNet(nn.Module):
             nn.Tanh(),
         )
 
-    def forward(self, x):
+    def _trunk(self, x):
         x = F.relu(self.bn1(self.conv1(x)))
         for r in self.res_layers:
             y = r(x)
             x = F.relu(x + y)
+        return x
+
+    def forward(self, x):
+        x = self._trunk(x)
         return self.policy_head(x), self.value_head(x).squeeze(-1)
+
+    def forward_legal(self, x, actions):
+        """
+        Like forward, but the policy logits are computed only for `actions`
+        (1-D LongTensor of action indices): the final policy layer uses just
+        the gathered weight rows instead of all ACTION_SIZE outputs.
+        """
+        x = self._trunk(x)
+        fc = self.policy_head[-1]
+        h = self.policy_head[:-1](x)
+        logits = F.linear(h, fc.weight.index_select(0, actions), fc.bias.index_select(0, actions))
+        return logits, self.value_head(x).squeeze(-1)
+
+    def forward_pairs(self, x, rows, actions):
+        """
+        Batched forward_legal: logits only for the (rows[i], actions[i]) pairs,
+        i.e. action actions[i] of position x[rows[i]]; returns a 1-D tensor
+        aligned with the pairs plus the values of all positions. The policy
+        layer is evaluated for the distinct actions of the batch only.
+        """
+        x = self._trunk(x)
+        fc = self.policy_head[-1]
+        h = self.policy_head[:-1](x)
+        distinct, inverse = torch.unique(actions, return_inverse=True)
+        logits = F.linear(h, fc.weight.index_select(0, distinct), fc.bias.index_select(0, distinct))
+        return logits[rows, inverse], self.value_head(x).squeeze(-1)
+
+
+def net_version(net):
+    """32-bit fingerprint of a network's weights, usable as the version of its evaluations."""
+    crc = 0
+    for tensor in net.state_dict().values():
+        crc = zlib.crc32(tensor.detach().cpu().contiguous().numpy().tobytes(), crc)
+    return crc
@@ -0,0 +1,268 @@
+# rl/rl_pretrain.py
+# Supervised pretraining of ChessNet on recorded games.
+#
+# PGN and FEN files are read as generators (one game / line at a time, plain,
+# .gz or .bz2), so multi-GB files are processed in constant memory. Every
+# position becomes an (observation, played action, z) sample with z the game
+# result from the side to move's point of view, and the net is trained with the
+# same policy_value_loss as self-play (the target policy is the played move).
+#
+#   python -m rl.rl_pretrain games.pgn.gz --epochs 2 --save pretrained.pt
+import argparse
+import bz2
+import gzip
+import random
+import re
+import sys
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+import torch.optim as optim
+
+from encoding import WHITE
+
+from .notation import STARTING_FEN, parse_fen, san_to_action
+from .rl_env import ChessEnv
+from .rl_net import ChessNet
+from .rl_train import policy_value_loss
+from .rl_utils import ACTION_SIZE, PROMO_KINDS, index_to_action, uci_to_action
+
+# game result -> value for White
+RESULTS = {"1-0": 1.0, "0-1": -1.0, "1/2-1/2": 0.0}
+
+HEADER_RE = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+TOKEN_RE = re.compile(r"\{[^}]*\}|;[^\n]*|\(|\)|\$\d+|[^\s(){};]+")
+MOVE_NUMBER_RE = re.compile(r"^\d+\.+")
+
+
+def open_text(path):
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def read_pgn(path):
+    """Yields (headers, san_moves) per game; comments, NAGs and variations are dropped."""
+    f = open_text(path)
+    try:
+        headers, movetext = {}, []
+        in_comment = False
+        for line in f:
+            line = line.strip()
+            if not in_comment and line.startswith("["):
+                if movetext:
+                    yield headers, _mainline(movetext)
+                    headers, movetext = {}, []
+                m = HEADER_RE.match(line)
+                if m:
+                    headers[m.group(1)] = m.group(2).replace('\\"', '"')
+            elif line and (in_comment or not line.startswith("%")):
+                movetext.append(line)
+                in_comment = _ends_in_comment(line, in_comment)
+        if headers or movetext:
+            yield headers, _mainline(movetext)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _ends_in_comment(line, in_comment):
+    for ch in line:
+        if in_comment:
+            in_comment = ch != "}"
+        elif ch == "{":
+            in_comment = True
+        elif ch == ";":
+            break
+    return in_comment
+
+
+def _mainline(movetext):
+    moves = []
+    depth = 0
+    for tok in TOKEN_RE.findall("\n".join(movetext)):
+        if tok == "(":
+            depth += 1
+        elif tok == ")":
+            depth = max(depth - 1, 0)
+        elif depth or tok[0] in "{;$" or tok in RESULTS or tok == "*":
+            continue
+        else:
+            tok = MOVE_NUMBER_RE.sub("", tok)
+            if tok:
+                moves.append(tok)
+    return moves
+
+
+def read_fens(path):
+    """
+    Yields (fen, rest) per non-empty line; rest is whatever follows the FEN
+    (EPD operations, a move, a result, ...). Lines starting with '#' are skipped.
+    """
+    f = open_text(path)
+    try:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            n = 6 if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit() else 4
+            yield " ".join(fields[:n]), " ".join(fields[n:])
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def game_samples(headers, moves, canonical=False):
+    """
+    (obs, action, z) for every position of one game; stops at the first unparsable move
+    and skips games whose FEN header is invalid.
+    canonical: observations and actions in the side-to-move encoding (see ChessEnv).
+    """
+    z = RESULTS.get(headers.get("Result"))
+    if z is None:
+        return
+    try:
+        gs = parse_fen(headers.get("FEN", STARTING_FEN))
+    except ValueError:
+        return
+    env = ChessEnv(gs, canonical=canonical)
+    for san in moves:
+        try:
+            action = san_to_action(gs, san)
+        except ValueError:
+            return
+        yield env._get_obs(), env.from_real_action(action), z if gs.turn == WHITE else -z
+        fr, to, promo = index_to_action(action)
+        gs.make_move(*divmod(fr, 8), *divmod(to, 8), promotion=PROMO_KINDS.get(promo))
+
+
+def pgn_samples(paths, canonical=False):
+    for path in paths:
+        for headers, moves in read_pgn(path):
+            yield from game_samples(headers, moves, canonical)
+
+
+def fen_samples(paths, canonical=False):
+    """
+    Samples from FEN lines of the form `<fen> <move> <result>`, with the move in
+    UCI or SAN and the result as in PGN (1-0, 0-1, 1/2-1/2). Other lines are skipped.
+    """
+    for path in paths:
+        for fen, rest in read_fens(path):
+            fields = rest.split()
+            if len(fields) < 2 or fields[1] not in RESULTS:
+                continue
+            try:
+                gs = parse_fen(fen)
+                try:
+                    action = uci_to_action(fields[0])
+                except ValueError:
+                    action = san_to_action(gs, fields[0])
+            except ValueError:
+                continue
+            z = RESULTS[fields[1]]
+            env = ChessEnv(gs, canonical=canonical)
+            yield env._get_obs(), env.from_real_action(action), z if gs.turn == WHITE else -z
+
+
+def file_samples(paths, canonical=False):
+    """Dispatches on extension: .fen / .epd (optionally compressed) are FEN lines, anything else PGN."""
+    for path in paths:
+        base = re.sub(r"\.(gz|bz2)$", "", path)
+        if base.endswith((".fen", ".epd")):
+            yield from fen_samples([path], canonical)
+        else:
+            yield from pgn_samples([path], canonical)
+
+
+def shuffled(samples, buffer_size=20000, rng=random):
+    """Approximate shuffle with a bounded buffer: consecutive positions of a game are highly correlated."""
+    buf = []
+    for s in samples:
+        if len(buf) < buffer_size:
+            buf.append(s)
+            continue
+        i = rng.randrange(buffer_size)
+        yield buf[i]
+        buf[i] = s
+    rng.shuffle(buf)
+    yield from buf
+
+
+def batches(samples, batch_size=256):
+    """Groups samples into (states (B, 13, 8, 8) float32, actions (B,) int64, z (B,) float32) arrays."""
+    states, actions, zs = [], [], []
+    for obs, action, z in samples:
+        states.append(obs)
+        actions.append(action)
+        zs.append(z)
+        if len(states) == batch_size:
+            yield np.stack(states), np.array(actions, dtype=np.int64), np.array(zs, dtype=np.float32)
+            states, actions, zs = [], [], []
+    if states:
+        yield np.stack(states), np.array(actions, dtype=np.int64), np.array(zs, dtype=np.float32)
+
+
+def pretrain_step(net, optimizer, states, actions, zs, device):
+    """train_step for one-hot policy targets given as action indices; returns the loss."""
+    x = torch.from_numpy(states).to(device)
+    target_p = F.one_hot(torch.from_numpy(actions).to(device), ACTION_SIZE).float()
+    target_v = torch.from_numpy(zs).to(device)
+
+    logits, v = net(x)
+    loss = policy_value_loss(logits, v, target_p, target_v)
+
+    optimizer.zero_grad()
+    loss.backward()
+    optimizer.step()
+    return float(loss.item())
+
+
+def pretrain(paths, net=None, epochs=1, batch_size=256, lr=1e-3, buffer_size=20000, save_path=None,
+             log_every=100, canonical=False):
+    """Supervised training of `net` (a fresh ChessNet if None) on PGN / FEN files; returns the net."""
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    net = (net or ChessNet()).to(device)
+    net.train()
+    optimizer = optim.Adam(net.parameters(), lr=lr)
+
+    for epoch in range(epochs):
+        total, steps = 0.0, 0
+        for states, actions, zs in batches(shuffled(file_samples(paths, canonical), buffer_size), batch_size):
+            total += pretrain_step(net, optimizer, states, actions, zs, device)
+            steps += 1
+            if steps % log_every == 0:
+                print(f"Epoch {epoch} step {steps}: loss={total / log_every:.4f}")
+                total = 0.0
+        print(f"Epoch {epoch} finished after {steps} steps")
+        if save_path:
+            torch.save(net.state_dict(), save_path)
+    return net
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supervised pretraining from PGN / FEN files")
+    parser.add_argument("files", nargs="+", help="PGN, .fen or .epd files (optionally .gz / .bz2)")
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--buffer", type=int, default=20000, help="shuffle buffer size in positions")
+    parser.add_argument("--init", default=None, help="start from these weights")
+    parser.add_argument("--save", default="pretrained.pt")
+    parser.add_argument("--canonical", action="store_true", help="side-to-move encoding (see ChessEnv)")
+    args = parser.parse_args()
+
+    net = ChessNet()
+    if args.init:
+        net.load_state_dict(torch.load(args.init, map_location="cpu"))
+    pretrain(args.files, net, args.epochs, args.batch_size, args.lr, args.buffer, args.save,
+             canonical=args.canonical)
+
+
+if __name__ == "__main__":
+    main()
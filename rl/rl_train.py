@@ -1,4 +1,5 @@
 # rl/rl_train.py
+import os
 import random
 from collections import deque
 
@@ -11,23 +12,54 @@ from .rl_net import ChessNet
 from .rl_env import ChessEnv
 from .rl_mcts import MCTS
 from .game_state import GameState
+from .notation import STARTING_FEN, parse_fen
+from .rl_utils import ACTION_SIZE
+from encoding import WHITE, BLACK, COLOR_MASK
 
 
-def self_play_episode(net, mcts_sim=25):
+def self_play_episode(net, mcts_sim=25, book=None, game_record=None, tablebase=None,
+                      max_moves=None, resign_threshold=None, resign_moves=4, eval_store=None, canonical=False):
+    """
+    book: optional OpeningBook consulted before any search is started.
+    game_record: optional list; (action, visit_count) is appended for every
+    move played, which is the input format of opening_book.build_book.
+    tablebase: optional Tablebase; games end as soon as a covered ending is reached.
+    max_moves: optional ply cap; capped games are scored as draws.
+    resign_threshold: a side resigns once its root value stays below this for
+    `resign_moves` of its own consecutive moves.
+    Repetitions and the fifty-move rule end the game as a draw (see ChessEnv.step).
+    eval_store: optional EvalStore shared with other processes (see MCTS).
+    canonical: side-to-move encoding (see ChessEnv); states and policies are recorded in it.
+    """
     gs = GameState()
-    env = ChessEnv(gs)
-    mcts = MCTS(net, n_sim=mcts_sim)
+    env = ChessEnv(gs, tablebase, canonical)
+    mcts = MCTS(net, n_sim=mcts_sim, tablebase=tablebase, eval_store=eval_store)
 
-    states, policies = [], []
-    outcome = 0.0
+    states, policies, turns = [], [], []
+    winner = None  # WHITE / BLACK; None for a draw or an unfinished game
+    low_value = {WHITE: 0, BLACK: 0}
 
     while True:
         obs = env._get_obs()
         legal = env.legal_action_indices()
         if not legal:
             break
+        if max_moves is not None and len(states) >= max_moves:
+            break
 
-        counts = mcts.run(env)
+        book_moves = book.lookup(env) if book is not None else []
+        if book_moves:
+            counts = np.zeros(ACTION_SIZE, dtype=np.int64)
+            for a, w in book_moves:
+                counts[a] = w
+        else:
+            counts = mcts.run(env)
+            if resign_threshold is not None:
+                side = gs.turn
+                low_value[side] = low_value[side] + 1 if mcts.root_value(env) < resign_threshold else 0
+                if low_value[side] >= resign_moves:
+                    winner = side ^ COLOR_MASK
+                    break
         policy = counts.astype(np.float32)
         s = policy.sum()
         if s > 0:
@@ -41,50 +73,220 @@ def self_play_episode(net, mcts_sim=25):
         if action not in legal:
             action = random.choice(legal)
 
-        env.step(action)
+        if game_record is not None:
+            game_record.append((env.to_real_action(action), int(counts[action])))
+
+        mover = gs.turn
+        _, reward, done, _ = env.step(action)
 
         states.append(obs)
         policies.append(policy)
+        turns.append(mover)
+
+        if done:
+            # reward is from the mover's point of view (see ChessEnv.step)
+            if reward == 1.0:
+                winner = mover
+            elif reward == -1.0:
+                winner = mover ^ COLOR_MASK
+            break
+
+    # z from the point of view of the side to move in each state
+    return [(s, p, 0.0 if winner is None else (1.0 if t == winner else -1.0))
+            for s, p, t in zip(states, policies, turns)]
+
+
+def play_game(white, black, max_moves=300, opening=(), canonical=False):
+    """
+    Plays one game between two bots exposing select_action(env).
+    Returns the score from White's point of view: 1.0, 0.5 or 0.0.
+    Games reaching max_moves plies are scored as draws.
+    opening: action indices (real board) played before the bots take over (they count towards max_moves).
+    canonical: the bots see a side-to-move encoded env (for networks trained that way).
+    """
+    env = ChessEnv(parse_fen(STARTING_FEN), canonical=canonical)  # headless, bots never draw
+    players = {WHITE: white, BLACK: black}
+    for action in opening:
+        env.step(env.from_real_action(action))
 
-        if not env.legal_action_indices():
-            outcome = 1.0
+    for _ in range(max_moves - len(opening)):
+        mover = env.gs.turn
+        action = players[mover].select_action(env)
+        if action is None:
             break
+        _, reward, done, _ = env.step(action)
+        if done:
+            if reward == 1.0:
+                return 1.0 if mover == WHITE else 0.0
+            if reward == -1.0:
+                return 0.0 if mover == WHITE else 1.0
+            return 0.5
+    return 0.5
+
+
+def evaluate_against(net, opponent, games=10, mcts_sim=25, max_moves=300, canonical=False):
+    """
+    Plays `games` games of the network (MCTS) against `opponent`, alternating colors.
+    Returns (wins, draws, losses) from the network's point of view.
+    """
+    net.eval()
+    wins = draws = losses = 0
+    for g in range(games):
+        bot = MCTS(net, n_sim=mcts_sim)
+        if g % 2 == 0:
+            score = play_game(bot, opponent, max_moves, canonical=canonical)
+        else:
+            score = 1.0 - play_game(opponent, bot, max_moves, canonical=canonical)
+        if score == 1.0:
+            wins += 1
+        elif score == 0.0:
+            losses += 1
+        else:
+            draws += 1
+    return wins, draws, losses
+
+
+def policy_value_loss(logits, v, target_p, target_v):
+    loss_p = -(target_p * torch.log_softmax(logits, dim=-1)).sum(dim=1).mean()
+    loss_v = F.mse_loss(v, target_v)
+    return loss_p + loss_v
+
+
+def train_step(net, optimizer, batch, device):
+    """One optimizer step on a list of (state, policy, z) samples; returns the loss."""
+    states = np.stack([b[0] for b in batch])
+    pis = np.stack([b[1] for b in batch])
+    zs = np.array([b[2] for b in batch], dtype=np.float32)
 
-    return [(s, p, outcome) for s, p in zip(states, policies)]
+    x = torch.tensor(states, dtype=torch.float32, device=device)
+    target_p = torch.tensor(pis, dtype=torch.float32, device=device)
+    target_v = torch.tensor(zs, dtype=torch.float32, device=device)
 
+    logits, v = net(x)
+    loss = policy_value_loss(logits, v, target_p, target_v)
 
-def train_loop(num_iters=50, games_per_iter=5):
+    optimizer.zero_grad()
+    loss.backward()
+    optimizer.step()
+    return float(loss.item())
+
+
+def pack_records(records):
+    """
+    Compacts (state, policy, z) samples: observation planes are 0/1 so they are
+    bit-packed, and policies are stored sparsely (they are zero off the legal moves).
+    """
+    states = np.stack([r[0] for r in records]).astype(np.uint8)
+    idx, val, lengths = [], [], []
+    for r in records:
+        nz = np.flatnonzero(r[1])
+        idx.append(nz.astype(np.uint16))
+        val.append(r[1][nz].astype(np.float32))
+        lengths.append(len(nz))
+    return {
+        "states": np.packbits(states.reshape(len(records), -1), axis=1),
+        "policy_idx": np.concatenate(idx) if idx else np.zeros(0, np.uint16),
+        "policy_val": np.concatenate(val) if val else np.zeros(0, np.float32),
+        "policy_len": np.array(lengths, dtype=np.int32),
+        "z": np.array([r[2] for r in records], dtype=np.float32),
+    }
+
+
+def unpack_records(packed, obs_shape=(13, 8, 8)):
+    n = len(packed["z"])
+    size = int(np.prod(obs_shape))
+    states = np.unpackbits(packed["states"], axis=1, count=size).astype(np.float32).reshape((n,) + obs_shape)
+    records = []
+    offset = 0
+    for i in range(n):
+        k = int(packed["policy_len"][i])
+        policy = np.zeros(ACTION_SIZE, dtype=np.float32)
+        policy[packed["policy_idx"][offset:offset + k]] = packed["policy_val"][offset:offset + k]
+        offset += k
+        records.append((states[i], policy, float(packed["z"][i])))
+    return records
+
+
+def save_checkpoint(path, net, optimizer, iteration, replay):
+    """
+    Writes model, optimizer, the next iteration, all RNG states and the replay
+    buffer (compacted with pack_records) to `path` atomically: the file is
+    written next to it and renamed over it, so an interrupted save never
+    leaves a truncated checkpoint behind.
+    """
+    state = {
+        "model": net.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "iteration": iteration,
+        "rng": {
+            "random": random.getstate(),
+            "numpy": np.random.get_state(),
+            "torch": torch.get_rng_state(),
+            "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+        },
+        "replay": pack_records(list(replay)) if replay else None,
+        "replay_size": replay.maxlen,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        torch.save(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, net, optimizer, device):
+    """Restores what save_checkpoint wrote; returns (next iteration, replay deque)."""
+    state = torch.load(path, map_location=device, weights_only=False)
+    net.load_state_dict(state["model"])
+    optimizer.load_state_dict(state["optimizer"])
+
+    rng = state["rng"]
+    random.setstate(rng["random"])
+    np.random.set_state(rng["numpy"])
+    torch.set_rng_state(rng["torch"])
+    if rng["cuda"] is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(rng["cuda"])
+
+    replay = deque(maxlen=state["replay_size"])
+    if state["replay"] is not None:
+        replay.extend(unpack_records(state["replay"]))
+    return state["iteration"], replay
+
+
+def train_loop(num_iters=50, games_per_iter=5, max_moves=400, resign_threshold=None,
+               checkpoint_path=None, checkpoint_every=1, resume=False, canonical=False):
+    """
+    canonical: train on side-to-move encoded self-play (see ChessEnv), which
+    puts colour-mirrored positions on the same network inputs.
+    checkpoint_path: if set, a checkpoint is saved there every `checkpoint_every`
+    iterations and after the last one. resume: continue from that checkpoint
+    (if it exists) with the same network, optimizer, replay and RNG states.
+    """
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     net = ChessNet().to(device)
     optimizer = optim.Adam(net.parameters(), lr=1e-3)
 
     replay = deque(maxlen=10000)
+    start = 0
+    if resume and checkpoint_path and os.path.exists(checkpoint_path):
+        start, replay = load_checkpoint(checkpoint_path, net, optimizer, device)
+        print(f"Resumed from {checkpoint_path} at iteration {start}, replay size {len(replay)}")
 
-    for it in range(num_iters):
+    for it in range(start, num_iters):
         for _ in range(games_per_iter):
-            replay.extend(self_play_episode(net, mcts_sim=25))
+            replay.extend(self_play_episode(net, mcts_sim=25, max_moves=max_moves,
+                                            resign_threshold=resign_threshold, canonical=canonical))
 
         if len(replay) < 100:
             print(f"Iter {it}: replay={len(replay)} (not enough yet)")
-            continue
-
-        for _ in range(5):
-            batch = random.sample(replay, min(64, len(replay)))
-            states = np.stack([b[0] for b in batch])
-            pis = np.stack([b[1] for b in batch])
-            zs = np.array([b[2] for b in batch], dtype=np.float32)
-
-            x = torch.tensor(states, dtype=torch.float32, device=device)
-            target_p = torch.tensor(pis, dtype=torch.float32, device=device)
-            target_v = torch.tensor(zs, dtype=torch.float32, device=device)
-
-            logits, v = net(x)
-            loss_p = -(target_p * torch.log_softmax(logits, dim=-1)).sum(dim=1).mean()
-            loss_v = F.mse_loss(v, target_v)
-            loss = loss_p + loss_v
+        else:
+            for _ in range(5):
+                batch = random.sample(replay, min(64, len(replay)))
+                train_step(net, optimizer, batch, device)
 
-            optimizer.zero_grad()
-            loss.backward()
-            optimizer.step()
+            print(f"Iteration {it} finished. Replay size: {len(replay)}")
 
-        print(f"Iteration {it} finished. Replay size: {len(replay)}")
+        if checkpoint_path and ((it + 1) % checkpoint_every == 0 or it + 1 == num_iters):
+            save_checkpoint(checkpoint_path, net, optimizer, it + 1, replay)
+    return net
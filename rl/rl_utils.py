@@ -1,12 +1,15 @@
 # rl/utils.py
 import itertools
 
+from encoding import QUEEN, ROOK, BISHOP, KNIGHT
+
 # squares: 0..63 (row*8 + col)
 def rc_to_sq(r,c): return r*8+c
 def sq_to_rc(s): return divmod(s,8)
 
 # Promotion types: 0=no, 1=queen,2=rook,3=bishop,4=knight
 PROM_TYPES = [0,1,2,3,4]
+PROMO_KINDS = {1: QUEEN, 2: ROOK, 3: BISHOP, 4: KNIGHT}
 
 # Build action mapping: (from_sq, to_sq, promo) -> index
 ACTION_LIST = []
@@ -25,3 +28,39 @@ def action_to_index(fr, to, promo=0):
 
 def index_to_action(idx):
     return INDEX_TO_ACTION[idx]
+
+# UCI long algebraic notation ("e2e4", "e7e8q"); row 0 is rank 8
+PROMO_LETTERS = {1: "q", 2: "r", 3: "b", 4: "n"}
+PROMO_FROM_LETTER = {v: k for k, v in PROMO_LETTERS.items()}
+
+def square_name(sq):
+    r, c = sq_to_rc(sq)
+    return "abcdefgh"[c] + str(8 - r)
+
+def parse_square(name):
+    if len(name) != 2 or name[0] not in "abcdefgh" or name[1] not in "12345678":
+        raise ValueError(f"bad square: {name!r}")
+    return rc_to_sq(8 - int(name[1]), "abcdefgh".index(name[0]))
+
+def action_to_uci(idx):
+    fr, to, promo = index_to_action(idx)
+    return square_name(fr) + square_name(to) + PROMO_LETTERS.get(promo, "")
+
+def uci_to_action(text):
+    """"e7e8q" -> action index; raises ValueError on malformed input."""
+    text = text.strip().lower()
+    if len(text) not in (4, 5) or (len(text) == 5 and text[4] not in PROMO_FROM_LETTER):
+        raise ValueError(f"bad UCI move: {text!r}")
+    promo = PROMO_FROM_LETTER[text[4]] if len(text) == 5 else 0
+    return action_to_index(parse_square(text[:2]), parse_square(text[2:4]), promo)
+
+# Colour mirroring for the canonical (side to move) encoding: ranks are flipped,
+# files kept, so a square r * 8 + c maps to (7 - r) * 8 + c.
+def flip_square(sq):
+    return sq ^ 56
+
+FLIP_ACTION = [ACTION_TO_INDEX[(fr ^ 56, to ^ 56, promo)] for fr, to, promo in ACTION_LIST]
+
+def flip_action(idx):
+    """Action index of the mirrored move (its own inverse)."""
+    return FLIP_ACTION[idx]
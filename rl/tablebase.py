@@ -0,0 +1,289 @@
+# rl/tablebase.py
+# Retrograde endgame tablebases for king + one piece vs king (KQK, KRK, KPK).
+#
+# Files hold one byte per position, indexed by
+#   ((stm * 64 + white_king) * 64 + black_king) * 64 + piece_square
+# with the extra piece always White (Black-strong positions are probed
+# colour-mirrored). Byte values, from the side to move's point of view:
+#   0          draw (or illegal position)
+#   1..127     win, mate in that many plies
+#   128..255   loss, mated in (256 - value - 1) plies  (255 = checkmated now)
+# Castling rights and en passant are ignored (irrelevant for these endings
+# except in contrived positions).
+import mmap
+import os
+import struct
+import sys
+from collections import defaultdict
+
+from pieces import MoveGenerator
+from rules import is_in_check
+from encoding import EMPTY, PAWN, ROOK, BISHOP, KNIGHT, QUEEN, KING, KIND_MASK, COLOR_MASK, WHITE, BLACK
+
+MAGIC = b"TBS1"
+HEADER = struct.Struct("<4s4s")
+SIZE = 2 * 64 * 64 * 64
+
+TABLES = {"KQK": QUEEN, "KRK": ROOK, "KPK": PAWN}
+PROMOTES_TO = {QUEEN: "KQK", ROOK: "KRK"}  # bishop/knight promotions are dead draws
+DRAWN_KINDS = (BISHOP, KNIGHT)
+
+NO_CASTLING = 0
+
+UNKNOWN, WIN, LOSS = 0, 1, 2
+
+
+def encode(wdl, dtm):
+    if wdl == WIN:
+        return dtm
+    if wdl == LOSS:
+        return 255 - dtm
+    return 0
+
+
+def decode(byte):
+    """Returns (wdl, dtm) with wdl in {1, 0, -1} from the side to move's view."""
+    if byte == 0:
+        return 0, 0
+    if byte < 128:
+        return 1, byte
+    return -1, 255 - byte
+
+
+def position_index(stm, wk, bk, x):
+    return ((stm * 64 + wk) * 64 + bk) * 64 + x
+
+
+def _board(kind, wk, bk, x):
+    board = bytearray(64)
+    board[wk] = WHITE | KING
+    board[bk] = BLACK | KING
+    board[x] = WHITE | kind
+    return board
+
+
+def _valid(kind, stm, wk, bk, x):
+    if wk == bk or wk == x or bk == x:
+        return None
+    if kind == PAWN and not 8 <= x < 56:
+        return None
+    board = _board(kind, wk, bk, x)
+    # the side that just moved must not be in check
+    if is_in_check(board, BLACK if stm == 0 else WHITE):
+        return None
+    return board
+
+
+def _squares(board):
+    wk = bk = x = None
+    for sq, p in enumerate(board):
+        if p == WHITE | KING:
+            wk = sq
+        elif p == BLACK | KING:
+            bk = sq
+        elif p:
+            x = sq
+    return wk, bk, x
+
+
+def _forward(movegen, board, color):
+    """Yields (r0, c0, r1, c1) legal moves for `color`."""
+    for sq in range(64):
+        if board[sq] & COLOR_MASK == color:
+            r, c = divmod(sq, 8)
+            for (r1, c1) in movegen.legal_moves_safe(board, r, c, None, NO_CASTLING):
+                yield r, c, r1, c1
+
+
+def _unmoves(movegen, kind, board, mover):
+    """
+    Yields predecessor boards where `mover` made a non-capturing move into `board`.
+    Pieces other than pawns move reversibly, so their origins are the empty squares
+    they could move to now; pawns step back one (or two, from the fourth rank).
+    """
+    for sq in range(64):
+        p = board[sq]
+        if p & COLOR_MASK != mover:
+            continue
+        r, c = divmod(sq, 8)
+        if p & KIND_MASK == PAWN:
+            origins = []
+            if r + 1 <= 6 and board[sq + 8] == EMPTY:
+                origins.append(sq + 8)
+                if r == 4 and board[sq + 16] == EMPTY:
+                    origins.append(sq + 16)
+        else:
+            origins = [r0 * 8 + c0 for (r0, c0) in movegen.legal_moves(board, r, c, None, NO_CASTLING)
+                       if board[r0 * 8 + c0] == EMPTY]
+        for origin in origins:
+            prev = bytearray(board)
+            prev[origin] = p
+            prev[sq] = EMPTY
+            yield prev
+
+
+def generate(name, directory, log=print):
+    """Builds `<directory>/<name>.tb` by retrograde analysis. Needs KQK/KRK first for KPK."""
+    kind = TABLES[name]
+    movegen = MoveGenerator()
+    sides = (WHITE, BLACK)
+
+    promo_tables = {}
+    if kind == PAWN:
+        for promo, tname in PROMOTES_TO.items():
+            promo_tables[promo] = Tablebase.load_table(os.path.join(directory, tname + ".tb"))
+
+    wdl = bytearray(SIZE)
+    dtm = bytearray(SIZE)
+    remaining = [0] * SIZE
+    exit_loss = {}  # positions with moves that leave the table into a lost position
+    buckets = defaultdict(list)
+
+    def mark(idx, result, d):
+        wdl[idx] = result
+        dtm[idx] = d
+        buckets[d].append(idx)
+
+    # pass 1: count legal moves, find mates and moves leaving the table
+    for stm in (0, 1):
+        color = sides[stm]
+        for wk in range(64):
+            for bk in range(64):
+                for x in range(64):
+                    board = _valid(kind, stm, wk, bk, x)
+                    if board is None:
+                        continue
+                    idx = position_index(stm, wk, bk, x)
+                    n = 0
+                    for r0, c0, r1, c1 in _forward(movegen, board, color):
+                        if board[r0 * 8 + c0] & KIND_MASK == PAWN and r1 == 0:
+                            n += 4
+                            for promo, table in promo_tables.items():
+                                child = bytearray(board)
+                                child[r1 * 8 + c1] = WHITE | promo
+                                child[r0 * 8 + c0] = EMPTY
+                                cwk, cbk, cx = _squares(child)
+                                cw, cd = decode(table[position_index(1, cwk, cbk, cx)])
+                                if cw == -1:
+                                    if wdl[idx] != WIN or dtm[idx] > cd + 1:
+                                        mark(idx, WIN, cd + 1)
+                                elif cw == 1:
+                                    n -= 1
+                                    exit_loss[idx] = max(exit_loss.get(idx, 0), cd + 1)
+                        else:
+                            # captures leave the table into a bare-king draw
+                            n += 1
+                    if n == 0 and wdl[idx] != WIN:
+                        if idx in exit_loss:
+                            mark(idx, LOSS, exit_loss[idx])
+                        elif is_in_check(board, color):
+                            mark(idx, LOSS, 0)
+                    remaining[idx] = n
+        log(f"{name}: counted moves for {'white' if stm == 0 else 'black'} to move")
+
+    # pass 2: propagate results backwards in order of increasing distance
+    d = 0
+    while buckets:
+        level = buckets.pop(d, [])
+        for idx in level:
+            if dtm[idx] != d or wdl[idx] == UNKNOWN:
+                continue  # stale entry, improved later
+            stm, rest = divmod(idx, 64 ** 3)
+            wk, rest = divmod(rest, 64 * 64)
+            bk, x = divmod(rest, 64)
+            board = _board(kind, wk, bk, x)
+            mover = sides[1 - stm]
+            for prev in _unmoves(movegen, kind, board, mover):
+                if is_in_check(prev, sides[stm]):
+                    continue
+                pwk, pbk, px = _squares(prev)
+                pidx = position_index(1 - stm, pwk, pbk, px)
+                if wdl[idx] == LOSS:
+                    if wdl[pidx] != WIN or dtm[pidx] > d + 1:
+                        mark(pidx, WIN, d + 1)
+                elif wdl[pidx] != WIN:
+                    remaining[pidx] -= 1
+                    if remaining[pidx] == 0:
+                        mark(pidx, LOSS, max(d + 1, exit_loss.get(pidx, 0)))
+        d += 1
+        if d > 127:
+            raise RuntimeError(f"{name}: distance to mate overflows one byte")
+
+    data = bytearray(SIZE)
+    for idx in range(SIZE):
+        if wdl[idx]:
+            data[idx] = encode(wdl[idx], dtm[idx])
+
+    path = os.path.join(directory, name + ".tb")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, name.encode().ljust(4, b"\0")))
+        f.write(data)
+    os.replace(tmp, path)
+    log(f"{name}: wrote {path}, longest mate {d - 1} plies")
+    return path
+
+
+class Tablebase:
+    """Probes generated tables through read-only memory maps."""
+
+    def __init__(self, directory):
+        self.tables = {}
+        for name, kind in TABLES.items():
+            path = os.path.join(directory, name + ".tb")
+            if os.path.exists(path):
+                self.tables[kind] = self.load_table(path)
+
+    @staticmethod
+    def load_table(path):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or len(mm) != HEADER.size + SIZE:
+            raise ValueError(f"{path} is not a tablebase file")
+        return memoryview(mm)[HEADER.size:]
+
+    def probe(self, board, turn):
+        """
+        Returns (wdl, dtm) for the side to move (wdl in {1, 0, -1}, dtm in plies),
+        or None if the material is not covered.
+        """
+        kings = {}
+        extra = None
+        for sq, p in enumerate(board):
+            if not p:
+                continue
+            if p & KIND_MASK == KING:
+                kings[p & COLOR_MASK] = sq
+            elif extra is not None:
+                return None
+            else:
+                extra = (p, sq)
+
+        if len(kings) != 2:
+            return None
+        if extra is None or extra[0] & KIND_MASK in DRAWN_KINDS:
+            return 0, 0
+
+        piece, x = extra
+        table = self.tables.get(piece & KIND_MASK)
+        if table is None:
+            return None
+
+        wk, bk, stm = kings[WHITE], kings[BLACK], 0 if turn == WHITE else 1
+        if piece & COLOR_MASK == BLACK:
+            # mirror ranks and swap colours so the extra piece is White's
+            wk, bk, x, stm = bk ^ 56, wk ^ 56, x ^ 56, 1 - stm
+        return decode(table[position_index(stm, wk, bk, x)])
+
+def generate_all(directory, names=tuple(TABLES)):
+    os.makedirs(directory, exist_ok=True)
+    wanted = set(names)
+    if "KPK" in wanted:
+        wanted.update(PROMOTES_TO.values())
+    for name in TABLES:  # dict order puts KPK's dependencies first
+        if name in wanted and not os.path.exists(os.path.join(directory, name + ".tb")):
+            generate(name, directory)
+
+if __name__ == "__main__":
+    generate_all(sys.argv[1] if len(sys.argv) > 1 else "tablebases", tuple(sys.argv[2:]) or tuple(TABLES))
@@ -0,0 +1,219 @@
+# rl/uci.py
+# Headless UCI engine around ChessNet + MCTS, for GUIs and tournament managers.
+#
+# The network is loaded once at startup and a single MCTS instance is kept for
+# the whole game, so the subtree of the previous move is reused (the tree is
+# only dropped on ucinewgame). Searches run in a background thread so that
+# stop / ponderhit / isready are answered while thinking.
+#
+#   python -m rl.uci --model model.pt [--tablebase DIR]
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # stdout is the protocol channel
+
+import numpy as np
+import torch
+
+from encoding import WHITE
+
+from .notation import STARTING_FEN, parse_fen
+from .rl_env import ChessEnv
+from .rl_mcts import MCTS
+from .rl_net import ChessNet
+from .tablebase import Tablebase
+from .rl_utils import action_to_uci, uci_to_action
+
+ENGINE_NAME = "ChessNet MCTS"
+GO_INTS = ("wtime", "btime", "winc", "binc", "movestogo", "movetime", "nodes", "depth")
+MOVE_OVERHEAD = 0.05  # seconds kept back per move for I/O and GUI lag
+DEFAULT_MOVESTOGO = 30
+
+
+class UCIEngine:
+    def __init__(self, net, tablebase=None, out=sys.stdout, canonical=False):
+        self.net = net
+        self.net.eval()
+        self.mcts = MCTS(net, tablebase=tablebase)
+        self.tablebase = tablebase
+        self.canonical = canonical
+        self.out = out
+        self.out_lock = threading.Lock()
+
+        self.env = ChessEnv(parse_fen(STARTING_FEN), tablebase, canonical)
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.deadline = None
+        self.pondering = False
+        self.go_params = {}
+
+    def send(self, line):
+        with self.out_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def handle(self, line):
+        """Processes one command line; returns False on quit."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        cmd, args = tokens[0], tokens[1:]
+
+        if cmd == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("id author chess-rl")
+            self.send("uciok")
+        elif cmd == "isready":
+            self.send("readyok")
+        elif cmd == "ucinewgame":
+            self.stop()
+            self.mcts.clear()
+        elif cmd == "position":
+            self.stop()
+            self.position(args)
+        elif cmd == "go":
+            self.stop()
+            self.go(args)
+        elif cmd == "stop":
+            self.stop()
+        elif cmd == "ponderhit":
+            self.pondering = False
+            if self.env is not None:
+                self.deadline = self._deadline(self.go_params)
+        elif cmd == "quit":
+            self.stop()
+            return False
+        return True
+
+    def position(self, args):
+        """
+        position startpos | fen <fen> [moves <uci> ...]
+        Every move must be legal; otherwise the position is rejected and go
+        answers "bestmove 0000" until a valid position is set.
+        """
+        if "moves" in args:
+            i = args.index("moves")
+            args, moves = args[:i], args[i + 1:]
+        else:
+            moves = []
+        self.env = None
+        try:
+            env = ChessEnv(parse_fen(" ".join(args[1:]) if args[:1] == ["fen"] else STARTING_FEN),
+                           self.tablebase, self.canonical)
+            for move in moves:
+                action = env.from_real_action(uci_to_action(move))
+                if action not in env.legal_action_indices():
+                    raise ValueError(f"illegal move {move}")
+                env.step(action)
+        except ValueError as e:
+            self.send(f"info string bad position: {e}")
+            return
+        self.env = env
+
+    def go(self, args):
+        params = {}
+        for i, tok in enumerate(args):
+            if tok in GO_INTS and i + 1 < len(args):
+                try:
+                    params[tok] = int(args[i + 1])
+                except ValueError:
+                    self.send(f"info string bad go argument: {tok} {args[i + 1]}")
+            elif tok in ("infinite", "ponder"):
+                params[tok] = True
+        self.go_params = params
+        if self.env is None:
+            self.send("info string no valid position set")
+            self.send("bestmove 0000")
+            return
+        self.pondering = "ponder" in params
+        self.deadline = self._deadline(params)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._search, args=(self.env, params), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def _deadline(self, params):
+        """Absolute stop time from movetime or the clock, None for no time limit."""
+        if "infinite" in params or self.pondering:
+            return None
+        if "movetime" in params:
+            return time.monotonic() + max(params["movetime"] / 1000 - MOVE_OVERHEAD, 0.01)
+        white = self.env.gs.turn == WHITE
+        left = params.get("wtime" if white else "btime")
+        if left is None:
+            return None
+        inc = params.get("winc" if white else "binc", 0)
+        budget = min(left / params.get("movestogo", DEFAULT_MOVESTOGO) + 0.75 * inc, left / 2) / 1000
+        return time.monotonic() + max(budget - MOVE_OVERHEAD, 0.01)
+
+    def _should_stop(self):
+        if self.stop_event.is_set():
+            return True
+        return self.deadline is not None and not self.pondering and time.monotonic() >= self.deadline
+
+    def _search(self, env, params):
+        legal = env.legal_action_indices()
+        start = time.monotonic()
+        nodes = 0
+        if legal:
+            if "nodes" in params:
+                n_sim = params["nodes"]
+            elif self.deadline is None and not (self.pondering or "infinite" in params):
+                n_sim = self.mcts.n_sim  # plain "go"
+            else:
+                n_sim = sys.maxsize  # until the deadline or stop
+            before = self.mcts.run(env, n_sim=0).sum()
+            counts = self.mcts.run(env, n_sim=n_sim, should_stop=self._should_stop)
+            nodes = int(counts.sum() - before)
+            best = max(legal, key=lambda a: counts[a])
+            move = action_to_uci(env.to_real_action(best))
+            elapsed = max(time.monotonic() - start, 1e-6)
+            self.send(f"info nodes {nodes} nps {int(nodes / elapsed)} time {int(elapsed * 1000)} "
+                      f"score cp {value_to_cp(self.mcts.root_value(env))} pv {move}")
+        else:
+            move = "0000"
+
+        # in infinite / ponder mode bestmove may only be sent after stop (or ponderhit for a finished search)
+        while ("infinite" in params or self.pondering) and not self.stop_event.is_set():
+            self.stop_event.wait(0.01)
+        self.send(f"bestmove {move}")
+
+
+def value_to_cp(value):
+    """Maps a [-1, 1] value to centipawns (tan curve used by other NN engines)."""
+    value = float(np.clip(value, -0.999, 0.999))
+    return int(round(111.714640912 * math.tan(1.5620688421 * value)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UCI engine for the trained ChessNet")
+    parser.add_argument("--model", default=None, help="ChessNet weights (random init if omitted)")
+    parser.add_argument("--sims", type=int, default=800, help="simulations for go without limits")
+    parser.add_argument("--tablebase", default=None, help="directory with endgame tables (rl.tablebase)")
+    parser.add_argument("--canonical", action="store_true", help="net uses the side-to-move encoding")
+    args = parser.parse_args()
+
+    net = ChessNet()
+    if args.model:
+        net.load_state_dict(torch.load(args.model, map_location="cpu"))
+    tablebase = Tablebase(args.tablebase) if args.tablebase else None
+
+    engine = UCIEngine(net, tablebase, canonical=args.canonical)
+    engine.mcts.n_sim = args.sims
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+    engine.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# rl/zobrist.py
+# 64-bit Zobrist position hashing for GameState.
+# Keys come from a fixed seed so hashes are stable across processes and runs
+# (needed for anything stored on disk).
+import random
+
+from encoding import PAWN, KING, WHITE, BLACK, COLOR_MASK
+
+PIECES = [color | kind for color in (WHITE, BLACK) for kind in range(PAWN, KING + 1)]
+
+_rng = random.Random(0x5A0B1257)
+PIECE_KEYS = [None] * 32  # indexed by piece code, then square
+for _p in PIECES:
+    PIECE_KEYS[_p] = [_rng.getrandbits(64) for _ in range(64)]
+CASTLE_KEYS = [_rng.getrandbits(64) for _ in range(16)]  # indexed by rights bitmask
+EP_KEYS = [_rng.getrandbits(64) for _ in range(8)]
+BLACK_TO_MOVE = _rng.getrandbits(64)
+
+
+def board_hash(board, turn, castling, en_passant_target):
+    h = CASTLE_KEYS[castling]
+    for sq, p in enumerate(board):
+        if p:
+            h ^= PIECE_KEYS[p][sq]
+    if en_passant_target:
+        h ^= EP_KEYS[en_passant_target[1]]
+    if turn == BLACK:
+        h ^= BLACK_TO_MOVE
+    return h
+
+
+def position_hash(gs):
+    return board_hash(gs.board, gs.turn, gs.castling, gs.en_passant_target)
+
+
+def canonical_hash(gs):
+    """
+    position_hash of the position seen from the side to move: with Black to move,
+    the hash of the mirrored position (ranks flipped, colours and castling rights
+    swapped, White to move). Equal for colour-mirrored positions.
+    """
+    if gs.turn == WHITE:
+        return gs.history[-1]
+    board = bytearray(64)
+    for sq, p in enumerate(gs.board):
+        if p:
+            board[sq ^ 56] = p ^ COLOR_MASK
+    castling = (gs.castling & 3) << 2 | gs.castling >> 2
+    ep = (7 - gs.en_passant_target[0], gs.en_passant_target[1]) if gs.en_passant_target else None
+    return board_hash(board, WHITE, castling, ep)
@@ -2,93 +2,129 @@
 # Board-wide rules: in-bounds checks, attack detection, check detection
 
 from settings import ROWS, COLS
+from encoding import PAWN, ROOK, BISHOP, KNIGHT, QUEEN, KING, KIND_MASK, COLOR_MASK, WHITE, BLACK
 
 def in_bounds(r, c):
     return 0 <= r < ROWS and 0 <= c < COLS
 
+# Precomputed per-square lookup tables (square index = r * COLS + c).
+def _targets(offsets):
+    table = []
+    for sq in range(ROWS * COLS):
+        r, c = divmod(sq, COLS)
+        table.append([(r + dr) * COLS + c + dc for dr, dc in offsets if in_bounds(r + dr, c + dc)])
+    return table
+
+def _rays(directions):
+    table = []
+    for sq in range(ROWS * COLS):
+        r, c = divmod(sq, COLS)
+        rays = []
+        for dr, dc in directions:
+            ray = []
+            nr, nc = r + dr, c + dc
+            while in_bounds(nr, nc):
+                ray.append(nr * COLS + nc)
+                nr += dr
+                nc += dc
+            if ray:
+                rays.append(ray)
+        table.append(rays)
+    return table
+
+KNIGHT_TARGETS = _targets([(2,1),(2,-1),(-2,1),(-2,-1),(1,2),(1,-2),(-1,2),(-1,-2)])
+KING_TARGETS = _targets([(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc])
+ORTHOGONAL_RAYS = _rays([(1,0),(-1,0),(0,1),(0,-1)])
+DIAGONAL_RAYS = _rays([(1,1),(1,-1),(-1,1),(-1,-1)])
+# squares a pawn of the given colour attacks from sq, and squares it would attack sq from
+PAWN_TARGETS = {WHITE: _targets([(-1,-1),(-1,1)]), BLACK: _targets([(1,-1),(1,1)])}
+PAWN_ATTACKERS = {WHITE: PAWN_TARGETS[BLACK], BLACK: PAWN_TARGETS[WHITE]}
+
 def attacks_square(board, r, c, attacking_color):
     """
-    Returns True if a piece of color `attacking_color` attacks square (r, c).
-    board: 8x8 array of strings like "wking", "bpawn", or "".
+    Returns True if a piece of color `attacking_color` (WHITE / BLACK) attacks square (r, c).
+    board: flat 64-element bytearray of piece codes (see encoding.py).
+    Works outward from the target: leaper tables first, then each ray up to its first blocker.
     """
-    for rr in range(ROWS):
-        for cc in range(COLS):
-            piece = board[rr][cc]
-            if not piece or piece[0] != attacking_color:
-                continue
-            kind = piece[1:]
+    sq = r * COLS + c
 
-            # pawn capture
-            if kind == "pawn":
-                direction = -1 if attacking_color == 'w' else 1
-                for dc in (-1, 1):
-                    ar, ac = rr + direction, cc + dc
-                    if (ar, ac) == (r, c) and in_bounds(ar, ac):
-                        return True
+    knight = attacking_color | KNIGHT
+    for s in KNIGHT_TARGETS[sq]:
+        if board[s] == knight:
+            return True
 
-            # knight
-            if kind == "knight":
-                for dr, dc in [(2,1),(2,-1),(-2,1),(-2,-1),(1,2),(1,-2),(-1,2),(-1,-2)]:
-                    ar, ac = rr + dr, cc + dc
-                    if (ar, ac) == (r, c) and in_bounds(ar, ac):
-                        return True
+    pawn = attacking_color | PAWN
+    for s in PAWN_ATTACKERS[attacking_color][sq]:
+        if board[s] == pawn:
+            return True
 
-            # bishop / queen (diagonals)
-            if kind in ("bishop", "queen"):
-                if abs(r - rr) == abs(c - cc) and abs(r - rr) != 0:
-                    step_r = (r - rr) // abs(r - rr)
-                    step_c = (c - cc) // abs(c - cc)
-                    pr, pc = rr + step_r, cc + step_c
-                    blocked = False
-                    while (pr, pc) != (r, c):
-                        if board[pr][pc] != "":
-                            blocked = True
-                            break
-                        pr += step_r
-                        pc += step_c
-                    if not blocked:
-                        return True
+    king = attacking_color | KING
+    for s in KING_TARGETS[sq]:
+        if board[s] == king:
+            return True
 
-            # rook / queen (files & ranks)
-            if kind in ("rook", "queen"):
-                # same row
-                if rr == r and cc != c:
-                    step = 1 if cc < c else -1
-                    blocked = False
-                    for x in range(cc + step, c, step):
-                        if board[r][x] != "":
-                            blocked = True
-                            break
-                    if not blocked:
-                        return True
-                # same column
-                if cc == c and rr != r:
-                    step = 1 if rr < r else -1
-                    blocked = False
-                    for y in range(rr + step, r, step):
-                        if board[y][c] != "":
-                            blocked = True
-                            break
-                    if not blocked:
-                        return True
+    queen = attacking_color | QUEEN
+    rook = attacking_color | ROOK
+    for ray in ORTHOGONAL_RAYS[sq]:
+        for s in ray:
+            p = board[s]
+            if p:
+                if p == rook or p == queen:
+                    return True
+                break
 
-            # king (adjacent)
-            if kind == "king":
-                if max(abs(rr - r), abs(cc - c)) == 1:
+    bishop = attacking_color | BISHOP
+    for ray in DIAGONAL_RAYS[sq]:
+        for s in ray:
+            p = board[s]
+            if p:
+                if p == bishop or p == queen:
                     return True
+                break
     return False
 
+def attacked_squares(board, attacking_color):
+    """
+    Returns a 64-element bytearray with 1 on every square attacked by `attacking_color`,
+    computed in one pass over that side's pieces (for UI highlighting and evaluation).
+    """
+    attacked = bytearray(ROWS * COLS)
+    for sq, piece in enumerate(board):
+        if piece & COLOR_MASK != attacking_color:
+            continue
+        kind = piece & KIND_MASK
+        if kind == PAWN:
+            targets = PAWN_TARGETS[attacking_color][sq]
+        elif kind == KNIGHT:
+            targets = KNIGHT_TARGETS[sq]
+        elif kind == KING:
+            targets = KING_TARGETS[sq]
+        else:
+            rays = []
+            if kind in (ROOK, QUEEN):
+                rays += ORTHOGONAL_RAYS[sq]
+            if kind in (BISHOP, QUEEN):
+                rays += DIAGONAL_RAYS[sq]
+            for ray in rays:
+                for s in ray:
+                    attacked[s] = 1
+                    if board[s]:
+                        break
+            continue
+        for s in targets:
+            attacked[s] = 1
+    return attacked
+
 def find_king(board, color):
-    for r in range(ROWS):
-        for c in range(COLS):
-            if board[r][c] == color + "king":
-                return (r, c)
-    return None
+    sq = board.find(color | KING)
+    if sq < 0:
+        return None
+    return divmod(sq, COLS)
 
 def is_in_check(board, color):
     kp = find_king(board, color)
     if not kp:
         # If king missing, consider it "in check" (invalid but treat as losing)
         return True
-    enemy = 'b' if color == 'w' else 'w'
+    enemy = color ^ COLOR_MASK
     return attacks_square(board, kp[0], kp[1], enemy)